@@ -0,0 +1,144 @@
+"""
+Measures the peak memory (RSS) per card of the image upload to the Gemini API, old path against the streaming one.
+A local HTTP server stands in for the API, it checks the request body and answers like generateContent.
+
+- legacy:    whole file read, base64 copy, JSON body containing it (the upload path before streaming)
+- streaming: GeminiImageDescriber.describe_image from the file
+- buffer:    GeminiImageDescriber.describe_image from an in-memory io.BytesIO (counts the buffer itself)
+
+Every variant runs in a fresh interpreter and reads its own high-water mark (VmHWM), so the peak is of that
+variant only (ru_maxrss would include the memory of the parent at fork time).
+
+Usage: python bench_upload.py [--size-mb 37] [--image capture.png] [--cards 3] [--parallel 1,4]
+"""
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+VARIANTS = ('legacy', 'streaming', 'buffer')
+RESPONSE = json.dumps({"candidates": [{"content": {"parts": [{"text": "{}"}]}}]}).encode("utf-8")
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        remaining = int(self.headers["Content-Length"])
+        # Reads the body in pieces and only keeps the end, the server must not distort the client's numbers
+        tail = b""
+        while remaining:
+            piece = self.rfile.read(min(remaining, 1024 * 1024))
+            if not piece:
+                break
+            remaining -= len(piece)
+            tail = (tail + piece)[-64:]
+        status = 200 if remaining == 0 and tail.endswith(b"}") else 400
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def proc_status_kb(field: str) -> int:
+    """VmRSS (current) or VmHWM (peak) of this process in KB"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} not in /proc/self/status")
+
+
+def legacy_upload(url: str, image_path: str) -> None:
+    import requests
+    with open(image_path, "rb") as img_file:
+        img_bytes = img_file.read()
+    data = {"contents": [{"parts": [{"text": "prompt"}, {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(img_bytes).decode("utf-8")}}]}]}
+    response = requests.post(url, json=data, headers={"Content-Type": "application/json"}, params={"key": "bench"})
+    response.raise_for_status()
+
+
+def run_variant(variant: str, url: str, image_path: str, cards: int, parallel: int) -> None:
+    """Child process: upload the image cards times with parallel threads, print the RSS numbers as JSON"""
+    import io
+    import requests  # noqa: F401, imported before the baseline is taken
+    from gemini_request import GeminiImageDescriber
+
+    describer = GeminiImageDescriber(api_key="bench")
+    describer.api_url = url
+    baseline = proc_status_kb("VmRSS")
+
+    def upload(_):
+        if variant == 'legacy':
+            legacy_upload(url, image_path)
+        elif variant == 'streaming':
+            describer.describe_image(image_path, prompt="prompt")
+        else:
+            with open(image_path, "rb") as f:
+                buffer = io.BytesIO(f.read())
+            describer.describe_image(buffer, prompt="prompt")
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        list(executor.map(upload, range(cards)))
+    peak = proc_status_kb("VmHWM")
+    print(json.dumps({"baseline_kb": baseline, "peak_kb": peak}))
+
+
+def measure(variant: str, url: str, image_path: str, cards: int, parallel: int) -> dict:
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), "--child", variant, "--url", url, "--image", image_path,
+         "--cards", str(cards), "--parallel", str(parallel)],
+        text=True,
+    )
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure peak RSS of the image upload per card")
+    parser.add_argument("--size-mb", type=int, default=37, help="size of the test image (37 MB = 4056x3040 RGB888)")
+    parser.add_argument("--image", default=None, help="use this image instead of a generated one")
+    parser.add_argument("--cards", type=int, default=3)
+    parser.add_argument("--parallel", default="1,4", help="comma separated numbers of concurrent uploads")
+    parser.add_argument("--child", choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.getcwd())
+
+    if args.child:
+        run_variant(args.child, args.url, args.image, args.cards, int(args.parallel))
+        return
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGeminiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/generateContent"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = args.image
+        if image_path is None:
+            image_path = os.path.join(tmp, "capture.png")
+            with open(image_path, "wb") as f:
+                f.write(b"\x89PNG\r\n\x1a\n")
+                for _ in range(args.size_mb):
+                    f.write(os.urandom(1024 * 1024))
+        size_mb = os.path.getsize(image_path) / 1024 / 1024
+        print(f"Image {size_mb:.1f} MB, {args.cards} cards per run")
+        for parallel in (int(p) for p in args.parallel.split(",")):
+            for variant in VARIANTS:
+                result = measure(variant, url, image_path, args.cards, parallel)
+                growth_mb = (result["peak_kb"] - result["baseline_kb"]) / 1024
+                print(f"  {variant:9} parallel {parallel}: peak RSS {result['peak_kb'] / 1024:7.1f} MB, "
+                      f"+{growth_mb:6.1f} MB over baseline = {growth_mb / size_mb:.2f}x image size")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Recognize a folder tree of card photos (e.g. collections sent in by sellers) with CardRecognizer.
+
+- a bounded pool of concurrent workers keeps the API busy instead of one round trip at a time
+- identical files (same SHA-256) are recognized only once
+- every finished card is recorded in a checkpoint and appended to the CSV right away,
+  running the same command again skips everything already done and rebuilds the CSV from the checkpoint
+- progress and ETA are printed per card
+
+Usage: python bulk_recognize.py <folder> [--output csv/bulk.csv] [--workers 8] [--magazin-name BULK] [--no-valuation]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from card_journal import CardJournal
+from carddata import CardData
+from csv_out import CardCsvWriter, write_carddata_csv
+from image_ki import CardRecognizer
+from valuation import CardValuator
+
+# === Default Configurable Constants ===
+DEFAULT_WORKERS = 8
+DEFAULT_MAGAZIN_NAME = 'BULK'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+RATE_LIMIT_RETRIES = 5  # retries of a card after HTTP 429, with exponential backoff
+RATE_LIMIT_BACKOFF = 2.0  # seconds before the first retry
+# =====================================
+
+
+def find_images(root: str):
+    """All image files below root, in a stable order"""
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(directory, filename)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class BulkRecognizer:
+    def __init__(self, workers=DEFAULT_WORKERS, valuation=True):
+        self.workers = workers
+        self.recognizer = CardRecognizer()
+        self.valuator = CardValuator(max_workers=workers) if valuation else None
+
+    @staticmethod
+    def _retry_rate_limited(function, *args):
+        """Call function, waiting and retrying when the API quota is exhausted (HTTP 429)"""
+        import requests
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            try:
+                return function(*args)
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+                    raise
+                delay = RATE_LIMIT_BACKOFF * 2 ** attempt
+                print(f"Rate limited, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _recognize(self, image_path: str) -> CardData:
+        """Identify and (optionally) value one card"""
+        card = self._retry_rate_limited(self.recognizer.recognize, image_path)
+        if self.valuator:
+            self._retry_rate_limited(self.valuator.value, card)
+        return card
+
+    def run(self, root: str, csv_path: str, checkpoint_path: str, magazin_name=DEFAULT_MAGAZIN_NAME) -> int:
+        """Returns the number of images that failed"""
+        checkpoint = CardJournal(checkpoint_path)
+        done_records = [record for record in checkpoint.records() if record.get('type') == 'bulk_card']
+        done = {record['sha256'] for record in done_records}
+        if done_records:
+            # The checkpoint is authoritative: rebuilding the CSV from it drops a row written twice or
+            # adds one missing after a crash between the two writes
+            cards = sorted((CardData.from_dict(record['card']) for record in done_records), key=lambda card: card.magazin_index)
+            write_carddata_csv(cards, csv_path + '.tmp')
+            os.replace(csv_path + '.tmp', csv_path)
+
+        # Done images keep the index stored in the checkpoint, new ones (also photos added to the folder since)
+        # are numbered after the highest of them, so a resumed batch never reuses an index
+        next_index = max((record['card']['magazin_index'] for record in done_records), default=0) + 1
+        jobs = []
+        seen = set()
+        duplicates = 0
+        for image_path in find_images(root):
+            sha256 = file_sha256(image_path)
+            if sha256 in seen:
+                duplicates += 1
+                continue
+            seen.add(sha256)
+            if sha256 not in done:
+                jobs.append((next_index, image_path, sha256))
+                next_index += 1
+        print(f"{len(seen)} unique images ({duplicates} duplicates skipped), {len(seen) - len(jobs)} already done, {len(jobs)} to recognize")
+
+        failed = 0
+        finished = 0
+        start = time.time()
+        pending_jobs = iter(jobs)
+        with CardCsvWriter(csv_path) as csv_writer, ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = {}
+
+            def fill():
+                # Keep the queue short so a huge folder does not turn into a huge backlog of futures
+                while len(in_flight) < self.workers * 2:
+                    job = next(pending_jobs, None)
+                    if job is None:
+                        return
+                    in_flight[executor.submit(self._recognize, job[1])] = job
+
+            fill()
+            while in_flight:
+                completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    index, image_path, sha256 = in_flight.pop(future)
+                    finished += 1
+                    try:
+                        card = future.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f"[{finished}/{len(jobs)}] {image_path}: Error: {e}")
+                        continue
+                    card.magazin_name = magazin_name
+                    card.magazin_index = index
+                    checkpoint.append({'type': 'bulk_card', 'sha256': sha256, 'card': card.to_dict()})
+                    csv_writer.write(card)
+                    elapsed = time.time() - start
+                    eta = elapsed / finished * (len(jobs) - finished)
+                    print(f"[{finished}/{len(jobs)}] {finished * 100 // len(jobs)}% ETA {format_duration(eta)} {image_path}: {card.kartenname} ({card.marktwert})")
+                fill()
+
+        print(f"Done in {format_duration(time.time() - start)}: {finished - failed} recognized, {failed} failed. CSV: {csv_path}")
+        print(f"Recognition stats: {self.recognizer.stats.as_dict()}")
+        return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognize a folder tree of card photos into a CSV")
+    parser.add_argument("folder")
+    parser.add_argument("--output", default=None, help="CSV file, rebuilt from the checkpoint when resuming (default: csv/bulk_<folder>.csv)")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (default: <output>.checkpoint.jsonl)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="concurrent API requests")
+    parser.add_argument("--magazin-name", default=DEFAULT_MAGAZIN_NAME, help="value of the Fachbuchstabe column")
+    parser.add_argument("--no-valuation", action="store_true", help="only identify the cards, skip the market value")
+    args = parser.parse_args()
+
+    folder_name = os.path.basename(os.path.normpath(args.folder))
+    csv_path = args.output or os.path.join(os.getcwd(), "csv", f"bulk_{folder_name}.csv")
+    checkpoint_path = args.checkpoint or csv_path + ".checkpoint.jsonl"
+    failed = BulkRecognizer(workers=args.workers, valuation=not args.no_valuation).run(args.folder, csv_path, checkpoint_path, magazin_name=args.magazin_name)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
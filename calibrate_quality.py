@@ -0,0 +1,123 @@
+"""
+Calibrates and checks the capture quality gate (frame_analysis.CaptureQualityGate) with the images in samples/.
+
+Every sample is placed on a plain tray at lores size (as the camera sees a card in the tray) and additionally
+degraded the ways bad captures look: out of focus, glare, card rotated in the tray. Prints the scores per
+image, the time per assessment and how many good captures would be rejected / bad ones let through with the
+current thresholds, plus the range of each score to place the thresholds in.
+
+Usage: python calibrate_quality.py [--samples samples] [--tray 110] [--no-reference]
+"""
+import argparse
+import os
+import time
+import numpy as np
+from PIL import Image, ImageFilter
+from frame_analysis import CardPresenceDetector, CaptureQualityGate
+
+LORES_SIZE = (1014, 760)
+CARD_HEIGHT = 0.8  # card height relative to the frame height
+VARIANTS = {
+    # name: (expected problem or None, degradation)
+    'gut': (None, lambda card: card),
+    'leicht schief': (None, lambda card: card.rotate(2.5, expand=True, resample=Image.BICUBIC, fillcolor=None)),
+    'unscharf': ('unscharf', None),  # blurs the whole frame, see place_card
+    'Reflexion': ('Reflexion', None),
+    'schief': ('schief', lambda card: card.rotate(12, expand=True, resample=Image.BICUBIC, fillcolor=None)),
+}
+
+
+def trim_background(card: Image.Image) -> Image.Image:
+    """
+    Cut off the white studio background (and soft drop shadow) some sample photos have around the card.
+    Rows and columns are kept where the share of non-white pixels is at least 30% of the card's.
+    """
+    non_white = np.asarray(card.convert('L')) < 245
+    row_share, column_share = non_white.mean(axis=1), non_white.mean(axis=0)
+    rows = np.nonzero(row_share > 0.3 * row_share.max())[0]
+    columns = np.nonzero(column_share > 0.3 * column_share.max())[0]
+    if not len(rows) or not len(columns):
+        return card
+    return card.crop((columns[0], rows[0], columns[-1] + 1, rows[-1] + 1))
+
+
+def place_card(card: Image.Image, tray_level: int, rng: np.random.Generator) -> np.ndarray:
+    """Grey lores frame with the card centered on a plain tray, with a little sensor noise"""
+    width, height = LORES_SIZE
+    card = card.convert('RGBA')
+    scale = CARD_HEIGHT * height / max(card.size)
+    card = card.resize((max(1, round(card.width * scale)), max(1, round(card.height * scale))), Image.BILINEAR)
+    frame = Image.new('RGBA', LORES_SIZE, (tray_level, tray_level, tray_level, 255))
+    frame.alpha_composite(card, ((width - card.width) // 2, (height - card.height) // 2))
+    gray = np.asarray(frame.convert('L'), dtype=np.float32)
+    return np.clip(gray + rng.normal(0, 2, gray.shape), 0, 255).astype(np.uint8)
+
+
+def add_glare(frame: np.ndarray) -> np.ndarray:
+    """Washed out elliptic spot on the card, like a reflection of the lighting on a glossy card"""
+    height, width = frame.shape
+    ys, xs = np.ogrid[:height, :width]
+    spot = ((xs - width * 0.45) / (width * 0.12)) ** 2 + ((ys - height * 0.4) / (height * 0.16)) ** 2
+    brightened = frame.astype(np.float32) + 255 * np.clip(1.5 - spot, 0, 1)
+    return np.clip(brightened, 0, 255).astype(np.uint8)
+
+
+def build_frames(path: str, tray_level: int, rng: np.random.Generator):
+    card = trim_background(Image.open(path).convert('RGB'))
+    for name, (expected, degrade) in VARIANTS.items():
+        if name == 'unscharf':
+            frame = np.asarray(Image.fromarray(place_card(card, tray_level, rng)).filter(ImageFilter.GaussianBlur(4)))
+        elif name == 'Reflexion':
+            frame = add_glare(place_card(card, tray_level, rng))
+        else:
+            frame = place_card(degrade(card.convert('RGBA')), tray_level, rng)
+        yield name, expected, frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the capture quality gate with sample images")
+    parser.add_argument("--samples", default="samples")
+    parser.add_argument("--tray", type=int, default=110, help="grey level of the empty tray")
+    parser.add_argument("--no-reference", action="store_true", help="find the card by the frame border instead of an empty tray reference")
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    rng = np.random.default_rng(0)
+    presence = None
+    if not args.no_reference:
+        presence = CardPresenceDetector()
+        presence.set_reference(np.full(LORES_SIZE[::-1], args.tray, dtype=np.uint8))
+    gate = CaptureQualityGate(presence)
+
+    scores = {name: [] for name in VARIANTS}
+    wrong = []
+    durations = []
+    for filename in sorted(os.listdir(args.samples)):
+        path = os.path.join(args.samples, filename)
+        print(filename)
+        for name, expected, frame in build_frames(path, args.tray, rng):
+            start = time.perf_counter()
+            quality = gate.assess(frame)
+            durations.append(time.perf_counter() - start)
+            scores[name].append(quality)
+            correct = expected in quality.problems if expected else quality.ok
+            if not correct:
+                wrong.append(f"{filename} ({name}): {quality}")
+            print(f"  {name:14} {'ok  ' if correct else 'FAIL'} {quality}")
+
+    print(f"\nAssessment: median {np.median(durations) * 1000:.2f} ms, max {max(durations) * 1000:.2f} ms")
+    print("Score ranges (min .. max):")
+    for name, qualities in scores.items():
+        skews = [q.skew for q in qualities if q.skew is not None]
+        print(f"  {name:14} sharpness {min(q.sharpness for q in qualities):7.0f} .. {max(q.sharpness for q in qualities):7.0f}"
+              f"   glare {min(q.glare for q in qualities):6.1%} .. {max(q.glare for q in qualities):6.1%}"
+              f"   skew {min(skews, default=0):5.1f} .. {max(skews, default=0):5.1f}°")
+    print(f"Thresholds: sharpness >= {gate.min_sharpness:.0f}, glare <= {gate.max_glare:.1%}, skew <= {gate.max_skew:.1f}°")
+    total = sum(len(qualities) for qualities in scores.values())
+    print(f"{total - len(wrong)}/{total} frames classified as expected")
+    for line in wrong:
+        print(f"  FAIL {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,53 @@ from time import sleep
 import logging
 from PIL import Image, ImageDraw
 from datetime import datetime
+import numpy as np
+from frame_analysis import wait_until_settled, DEFAULT_SETTLE_TIMEOUT
 
 class BaseCameraCapture(ABC):
     """Base class defining the camera interface"""
+
+    last_settle_time = None  # Seconds the last capture waited for the image to settle
+    last_frame = None  # Low-res grey frame of the last capture (same exposure), used for the quality check
     
     @abstractmethod
     def capture(self, output_path='karte.png', preview_time=5, show_preview=True):
         """Capture an image and save it to the given path"""
         pass
 
+    @abstractmethod
+    def capture_lores(self):
+        """Return the current low-res frame as 2D grey array (used for presence checks)"""
+        pass
+
+    def warm_up(self):
+        """Open the camera hardware ahead of the first capture"""
+        pass
+
+    def close(self):
+        """Release the camera hardware"""
+        pass
+
 class MockCameraCapture(BaseCameraCapture):
     """Mock camera that generates test images instead of using real hardware"""
     
-    def __init__(self):
+    LORES_SIZE = (1014, 760)
+
+    def __init__(self, stack_size=None):
         self._capture_count = 0
+        # Number of cards in the simulated input stack (None = endless), see MOCK_STACK_SIZE
+        if stack_size is None and os.getenv('MOCK_STACK_SIZE'):
+            stack_size = int(os.getenv('MOCK_STACK_SIZE'))
+        self._stack_size = stack_size
+
+    def capture_lores(self):
+        """Empty tray frame once the simulated stack is used up, otherwise a frame with a card"""
+        width, height = self.LORES_SIZE
+        img = Image.new('L', (width, height), color=200)
+        if self._stack_size is None or self._capture_count < self._stack_size:
+            draw = ImageDraw.Draw(img)
+            draw.rectangle([width // 4, height // 8, width * 3 // 4, height * 7 // 8], fill=60)
+        return np.asarray(img)
     
     def capture(self, output_path='karte.png', preview_time=5, show_preview=True):
         """Create a test image with timestamp and counter"""
@@ -60,6 +93,19 @@ class MockCameraCapture(BaseCameraCapture):
         img.save(output_path)
         logging.info(f"[MOCK] Captured test image to {output_path}")
         sleep(0.5)  # Simulate brief capture time
+        self.last_settle_time = 0.0
+        self.last_frame = self._lores_of(img)
+
+    def _lores_of(self, img):
+        """Low-res frame with the test image lying in the tray, printed darker than the tray like in capture_lores"""
+        width, height = self.LORES_SIZE
+        frame = np.full((height, width), 200, dtype=np.uint8)
+        left, top, right, bottom = width // 4, height // 8, width * 3 // 4, height * 7 // 8
+        card = np.asarray(img.convert('L').resize((right - left, bottom - top), Image.NEAREST)) // 2
+        # fine print pattern standing in for card artwork, a blank test image would not pass as sharp
+        ys, xs = np.indices(card.shape)
+        frame[top:bottom, left:right] = card + ((xs // 8 + ys // 8) % 2 * 40).astype(np.uint8)
+        return frame
 
 try:
     from picamera2 import Picamera2, Preview
@@ -67,37 +113,78 @@ try:
     class PiCameraCapture(BaseCameraCapture):
         """Real camera implementation using picamera2"""
         
-        def __init__(self):
-            pass
+        LORES_SIZE = (1014, 760)
+
+        def __init__(self, settle_timeout=DEFAULT_SETTLE_TIMEOUT):
+            self.settle_timeout = settle_timeout
+            self._picam2 = None
+            self._still_config = None
+            self._preview_config = None
+
+        def _camera(self):
+            """Open the camera once and keep it running in still configuration"""
+            if self._picam2 is None:
+                picam2 = Picamera2()
+                # Create preview configuration (for live preview)
+                self._preview_config = picam2.create_preview_configuration(
+                    main={'size': (4056, 3040)}, 
+                    lores={'size': self.LORES_SIZE},
+                    display='main'
+                )
+                # Create still configuration (for capture)
+                self._still_config = picam2.create_still_configuration(
+                    main={'size': (4056, 3040), 'format': 'RGB888'},
+                    lores={'size': self.LORES_SIZE},
+                    display='main'
+                )
+                picam2.configure(self._still_config)
+                picam2.start()
+                self._picam2 = picam2
+            return self._picam2
+
+        def warm_up(self):
+            self._camera()
+
+        def capture_lores(self):
+            """Grab a frame from the lores stream and return its Y (grey) plane"""
+            picam2 = self._camera()
+            width, height = self.LORES_SIZE
+            frame = picam2.capture_array('lores')
+            # lores is YUV420: the first `height` rows are the luminance plane, rows may be padded
+            return frame[:height, :width]
         
         def capture(self, output_path='karte.png', preview_time=5, show_preview=True):
-            picam2 = Picamera2()
-            # Create preview configuration (for live preview)
-            preview_config = picam2.create_preview_configuration(
-                main={'size': (4056, 3040)}, 
-                lores={'size': (1014, 760)},
-                display='main'
-            )
-            # Create still configuration (for capture)
-            still_config = picam2.create_still_configuration(
-                main={'size': (4056, 3040), 'format': 'RGB888'},
-                lores={'size': (1014, 760)},
-                display='main'
-            )
+            picam2 = self._camera()
             if show_preview:
-                picam2.configure(preview_config)
+                picam2.stop()
+                picam2.configure(self._preview_config)
                 picam2.start_preview(Preview.QTGL)
                 picam2.start()
-                sleep(preview_time)
+                # Show the preview at most preview_time seconds, stop early once the image is stable and sharp
+                wait_until_settled(self.capture_lores, timeout=preview_time)
                 picam2.stop_preview()
                 picam2.stop()
-            # Switch to still configuration for capture
-            picam2.configure(still_config)
-            picam2.start()
+                # Switch back to still configuration for capture
+                picam2.configure(self._still_config)
+                picam2.start()
             picam2.autofocus_cycle()
-            sleep(2)  # Short settle before capture
-            picam2.capture_file(output_path)
-            picam2.close()
+            # Wait until the card rests and is in focus instead of a fixed delay
+            self.last_settle_time, settled = wait_until_settled(self.capture_lores, timeout=self.settle_timeout)
+            if not settled:
+                logging.warning(f"Image not settled after {self.last_settle_time:.2f}s, capturing anyway")
+            request = picam2.capture_request()
+            try:
+                request.save('main', output_path)
+                # lores frame of the same request, so the quality check sees exactly the saved exposure
+                width, height = self.LORES_SIZE
+                self.last_frame = request.make_array('lores')[:height, :width]
+            finally:
+                request.release()
+
+        def close(self):
+            if self._picam2 is not None:
+                self._picam2.close()
+                self._picam2 = None
 except ImportError:
     logging.warning("picamera2 not available, PiCameraCapture will not be available")
     PiCameraCapture = None
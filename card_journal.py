@@ -0,0 +1,144 @@
+import os
+import json
+import threading
+from typing import Dict, Iterator, List, Optional
+from carddata import CardData
+
+# === Default Configurable Constants ===
+DEFAULT_JOURNAL_PATH = os.path.join("journal", "cards.jsonl")
+DEFAULT_COMPACT_THRESHOLD = 1000  # records after the last snapshot before the journal gets compacted
+# =====================================
+
+
+class JournalState:
+    """State restored from the journal"""
+
+    def __init__(self):
+        self.cards: List[CardData] = []
+        self.magazin_name: Optional[str] = None
+        self.magazine_size: Optional[int] = None
+        self.current_position = 0  # last slot of the last run that received a card
+        self.run_started_at: Optional[float] = None
+        self.records_since_snapshot = 0
+        self._by_image: Dict[str, CardData] = {}
+
+    @property
+    def last_run_finished(self) -> bool:
+        return bool(self.magazine_size) and self.current_position >= self.magazine_size
+
+    def apply(self, record: dict) -> None:
+        kind = record.get('type')
+        if kind == 'snapshot':
+            self.__init__()
+            for card_data in record['cards']:
+                self._add_card(CardData.from_dict(card_data))
+            self.magazin_name = record.get('magazin_name')
+            self.magazine_size = record.get('magazine_size')
+            self.current_position = record.get('current_position', 0)
+            self.run_started_at = record.get('run_started_at')
+            return
+        self.records_since_snapshot += 1
+        if kind == 'run_start':
+            self.magazin_name = record['magazin_name']
+            self.magazine_size = record['magazine_size']
+            self.current_position = record['start_index'] - 1
+            self.run_started_at = record['started_at']
+        elif kind == 'card':
+            card = CardData.from_dict(record['card'])
+            self._add_card(card)
+            self.current_position = card.magazin_index
+        elif kind == 'valued':
+            card = self._by_image.get(record['image_path'])
+            if card is not None:
+                card.marktwert = record['marktwert']
+
+    def _add_card(self, card: CardData) -> None:
+        self.cards.append(card)
+        self._by_image[card.image_path] = card
+
+    def snapshot(self) -> dict:
+        return {
+            'type': 'snapshot',
+            'cards': [card.to_dict() for card in self.cards],
+            'magazin_name': self.magazin_name,
+            'magazine_size': self.magazine_size,
+            'current_position': self.current_position,
+            'run_started_at': self.run_started_at,
+        }
+
+
+class CardJournal:
+    """
+    Append-only, fsync'd JSON lines journal of processed cards and run starts.
+    Replayed on startup so a crash or power loss loses neither recognitions nor the magazine position.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, compact_threshold=DEFAULT_COMPACT_THRESHOLD):
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self.torn = False
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+    def append(self, record: dict) -> None:
+        """Write a record and only return once it is on disk"""
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def record_run_start(self, magazin_name: str, start_index: int, magazine_size: int, started_at: float) -> None:
+        self.append({'type': 'run_start', 'magazin_name': magazin_name, 'start_index': start_index, 'magazine_size': magazine_size, 'started_at': started_at})
+
+    def record_card(self, card: CardData) -> None:
+        self.append({'type': 'card', 'card': card.to_dict()})
+
+    def record_valuation(self, card: CardData) -> None:
+        self.append({'type': 'valued', 'image_path': card.image_path, 'marktwert': card.marktwert})
+
+    def records(self) -> Iterator[dict]:
+        """All intact records in order. Sets self.torn if a broken line was skipped."""
+        self.torn = False
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash during append, everything before it is intact
+                    print(f"Journal: Ignoring incomplete record in line {line_number}")
+                    self.torn = True
+
+    def load(self) -> JournalState:
+        """Replay the journal, compacting it afterwards if it grew too long"""
+        state = JournalState()
+        if not os.path.exists(self.path):
+            return state
+        for record in self.records():
+            state.apply(record)
+        print(f"Journal: Restored {len(state.cards)} cards, position {state.current_position} of magazine {state.magazin_name}")
+        # Rewrite a torn journal as well, otherwise the next append would continue the broken line
+        if self.torn or state.records_since_snapshot > self.compact_threshold:
+            self.compact(state)
+        return state
+
+    def compact(self, state: JournalState) -> None:
+        """Atomically replace the journal by a single snapshot record of the given state"""
+        tmp_path = self.path + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(state.snapshot(), ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            # Persist the rename itself
+            dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        state.records_since_snapshot = 0
+        print(f"Journal: Compacted to {len(state.cards)} cards")
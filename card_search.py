@@ -0,0 +1,100 @@
+import re
+import bisect
+import heapq
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Set
+from carddata import CardData
+
+SEARCH_FIELDS = ('kartenname', 'edition', 'kartennummer', 'verlag')
+DEFAULT_SEARCH_LIMIT = 50
+MIN_PREFIX_LENGTH = 2  # shorter query tokens only match whole tokens, 'a' would match nearly everything
+
+_UMLAUTS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue'})
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def fold(text: str) -> str:
+    """Lower case without accents: 'Özil' -> 'ozil', 'Straße' -> 'strasse'"""
+    text = (text or '').lower().replace('ß', 'ss')
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> Set[str]:
+    """Folded tokens, words with umlauts additionally in their ae/oe/ue spelling ('Özil' -> ozil, oezil)"""
+    lowered = (text or '').lower()
+    if lowered.isascii():
+        return set(_TOKEN.findall(lowered))  # nothing to fold, the common case for names and numbers
+    tokens = set(_TOKEN.findall(fold(lowered)))
+    expanded = lowered.translate(_UMLAUTS)
+    if expanded != lowered:
+        tokens.update(_TOKEN.findall(fold(expanded)))
+    return tokens
+
+
+class CardSearchIndex:
+    """
+    In-memory inverted index over kartenname, edition, kartennummer and verlag.
+    Every query token matches indexed tokens it is a prefix of, all query tokens must match.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cards: List[CardData] = []
+        self._postings: Dict[str, Set[int]] = {}  # token -> card ids (positions in _cards)
+        self._vocabulary: List[str] = []  # sorted tokens for prefix lookups
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def add(self, card: CardData) -> None:
+        with self._lock:
+            card_id = len(self._cards)
+            self._cards.append(card)
+            for field in SEARCH_FIELDS:
+                for token in tokenize(getattr(card, field, '')):
+                    postings = self._postings.get(token)
+                    if postings is None:
+                        postings = self._postings[token] = set()
+                        bisect.insort(self._vocabulary, token)
+                    postings.add(card_id)
+
+    def add_all(self, cards: Iterable[CardData]) -> None:
+        """Index many cards at once, e.g. all cards restored from the journal; sorts the vocabulary once"""
+        with self._lock:
+            for card in cards:
+                card_id = len(self._cards)
+                self._cards.append(card)
+                for field in SEARCH_FIELDS:
+                    for token in tokenize(getattr(card, field, '')):
+                        self._postings.setdefault(token, set()).add(card_id)
+            self._vocabulary = sorted(self._postings)
+
+    def _matching(self, prefix: str) -> Set[int]:
+        """Ids of cards having a token starting with prefix"""
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return set(self._postings.get(prefix, ()))
+        matches: Set[int] = set()
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matches |= self._postings[token]
+        return matches
+
+    def search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[CardData]:
+        """Cards matching all tokens of the query, exact token matches first, then most recently processed"""
+        terms = set(_TOKEN.findall(fold(query)))
+        if not terms:
+            return []
+        with self._lock:
+            result = None
+            for term in sorted(terms, key=len, reverse=True):  # longer terms are more selective
+                matches = self._matching(term)
+                result = matches if result is None else result & matches
+                if not result:
+                    return []
+            def rank(card_id):
+                exact = sum(1 for term in terms if card_id in self._postings.get(term, ()))
+                return (-exact, -(self._cards[card_id].processed_at or 0))
+            return [self._cards[card_id] for card_id in heapq.nsmallest(limit, result, key=rank)]
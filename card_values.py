@@ -0,0 +1,81 @@
+import re
+from typing import Optional, Tuple
+from carddata import CardData
+
+# Condition scale used in the recognition prompt, index = stufe (0 = best)
+ZUSTAND_SCALE = ('Perfekt', 'Booster Frisch', 'Leichte Gebrauchspuren', 'Sichtbare Abnutzung', 'Starke Abnutzung', 'Beschädigt', 'Kaputt')
+_ZUSTAND_LOOKUP = {name.lower(): stufe for stufe, name in enumerate(ZUSTAND_SCALE)}
+
+CURRENCY_SYMBOLS = {
+    '€': 'EUR', 'eur': 'EUR', 'euro': 'EUR',
+    '$': 'USD', 'usd': 'USD', 'us$': 'USD',
+    '£': 'GBP', 'gbp': 'GBP',
+    'chf': 'CHF',
+}
+DEFAULT_CURRENCY = 'EUR'
+
+_NUMBER = re.compile(r'\d[\d.,]*')
+_CURRENCY_TOKEN = r'(?:us\$|€|\$|£|euro|eur|usd|gbp|chf)'
+# '10-15 €', '15€ - 20€', '€15 bis €20', '10 EUR - 15 EUR': a currency may follow or precede either number
+_RANGE = re.compile(r'(\d[\d.,]*)\s*' + _CURRENCY_TOKEN + r'?\s*(?:-|–|bis)\s*' + _CURRENCY_TOKEN + r'?\s*(\d[\d.,]*)', re.IGNORECASE)
+_CURRENCY = re.compile(r'us\$|€|\$|£|\b(?:eur|euro|usd|gbp|chf)\b', re.IGNORECASE)
+_YEAR = re.compile(r'\b(?:19|20)\d{2}\b')
+
+
+def _parse_number(text: str) -> Optional[float]:
+    """Parse '1.234,56', '1,234.56', '12,5' or '12.50'"""
+    text = text.rstrip('.,')
+    if ',' in text and '.' in text:
+        # The separator that comes last is the decimal separator
+        if text.rfind(',') > text.rfind('.'):
+            text = text.replace('.', '').replace(',', '.')
+        else:
+            text = text.replace(',', '')
+    elif ',' in text:
+        integer, _, fraction = text.rpartition(',')
+        text = f"{integer.replace(',', '')}.{fraction}" if len(fraction) != 3 else text.replace(',', '')
+    elif text.count('.') > 1 or (text.count('.') == 1 and len(text.rpartition('.')[2]) == 3):
+        text = text.replace('.', '')
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_marktwert(marktwert: str) -> Tuple[Optional[float], Optional[str]]:
+    """
+    Parse a free text market value like '12,50 €', 'ca. $5', '10-15 EUR' into (value, currency).
+    Ranges give their mean. Returns (None, None) for 'unbekannt', 'ausstehend' or anything without a number.
+    """
+    if not marktwert:
+        return None, None
+    range_match = _RANGE.search(marktwert)
+    if range_match:
+        # '10-15 €' / '10 bis 15 €'
+        low, high = _parse_number(range_match.group(1)), _parse_number(range_match.group(2))
+        value = (low + high) / 2 if low is not None and high is not None else None
+    else:
+        number_match = _NUMBER.search(marktwert)
+        value = _parse_number(number_match.group(0)) if number_match else None
+    if value is None:
+        return None, None
+    currency_match = _CURRENCY.search(marktwert)
+    currency = CURRENCY_SYMBOLS[currency_match.group(0).lower()] if currency_match else DEFAULT_CURRENCY
+    return round(value, 2), currency
+
+
+def parse_year(erscheinungsjahr: str) -> Optional[int]:
+    match = _YEAR.search(erscheinungsjahr or '')
+    return int(match.group(0)) if match else None
+
+
+def parse_zustand(zustand: str) -> Optional[int]:
+    """Position on ZUSTAND_SCALE (0 = Perfekt ... 6 = Kaputt), None if not on the scale"""
+    return _ZUSTAND_LOOKUP.get((zustand or '').strip().lower())
+
+
+def normalize_card(card: CardData) -> None:
+    """Set the numeric columns derived from the free text fields"""
+    card.marktwert_wert, card.marktwert_waehrung = parse_marktwert(card.marktwert)
+    card.erscheinungsjahr_wert = parse_year(card.erscheinungsjahr)
+    card.zustand_stufe = parse_zustand(card.zustand)
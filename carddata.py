@@ -1,7 +1,13 @@
 import time
 
+# Recognized fields in the order of the CardData constructor
+CARD_FIELDS = (
+    'kartenname', 'edition', 'kartennummer', 'sprache', 'verlag', 'erscheinungsjahr', 'region', 'seltenheit',
+    'kartentyp', 'subtyp', 'farbe', 'spezialeffekte', 'limitierung', 'autogramm', 'memorabilia', 'zustand', 'marktwert'
+)
+
 class CardData:
-    def __init__(self, image_path, kartenname, edition, kartennummer, sprache, verlag, erscheinungsjahr, region, seltenheit, kartentyp, subtyp, farbe, spezialeffekte, limitierung, autogramm, memorabilia, zustand, marktwert, magazin_name: str = 'A', magazin_index: int = 1, processed_at: float = None):
+    def __init__(self, image_path, kartenname, edition, kartennummer, sprache, verlag, erscheinungsjahr, region, seltenheit, kartentyp, subtyp, farbe, spezialeffekte, limitierung, autogramm, memorabilia, zustand, marktwert, magazin_name: str = 'A', magazin_index: int = 1, processed_at: float = None, settle_time: float = None, run_id: int = None):
         self.image_path = image_path
         self.kartenname = kartenname
         self.edition = edition
@@ -23,5 +29,31 @@ class CardData:
         self.magazin_name = magazin_name
         self.magazin_index = magazin_index
         self.processed_at = processed_at if processed_at is not None else time.time()
+        self.settle_time = settle_time  # seconds the camera waited for the card to rest before capture
+        self.run_id = run_id
+        # Numeric columns derived from the free text fields, see card_values.normalize_card
+        self.marktwert_wert = None
+        self.marktwert_waehrung = None
+        self.erscheinungsjahr_wert = None
+        self.zustand_stufe = None
+        # Capture quality, see ProcessController.capture_card
+        self.capture_count = None
+        self.quality_sharpness = None
+        self.quality_glare = None
+        self.quality_skew = None
+        self.quality_problems = None
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CardData':
+        data = dict(data)
+        card = cls(data.pop('image_path', ''), *(data.pop(field, 'unbekannt') for field in CARD_FIELDS))
+        # Magazine info, processed_at and any additional attributes
+        for name, value in data.items():
+            setattr(card, name, value)
+        return card
+
     def __repr__(self):
-        return f"CardData({self.image_path}, {self.kartenname}, {self.edition}, {self.kartennummer}, {self.sprache}, {self.verlag}, {self.erscheinungsjahr}, {self.region}, {self.seltenheit}, {self.kartentyp}, {self.subtyp}, {self.farbe}, {self.spezialeffekte}, {self.limitierung}, {self.autogramm}, {self.memorabilia}, {self.zustand}, {self.marktwert}, magazin_name={self.magazin_name}, magazin_index={self.magazin_index}, processed_at={self.processed_at})"
+        return f"CardData({self.image_path}, {self.kartenname}, {self.edition}, {self.kartennummer}, {self.sprache}, {self.verlag}, {self.erscheinungsjahr}, {self.region}, {self.seltenheit}, {self.kartentyp}, {self.subtyp}, {self.farbe}, {self.spezialeffekte}, {self.limitierung}, {self.autogramm}, {self.memorabilia}, {self.zustand}, {self.marktwert}, magazin_name={self.magazin_name}, magazin_index={self.magazin_index}, processed_at={self.processed_at}, settle_time={self.settle_time})"
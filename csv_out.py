@@ -2,6 +2,38 @@ import os
 from typing import Iterable, List
 from carddata import CardData
 
+CSV_HEADER = [
+    "Fachbuchstabe","Fachnummer","Kartenname","Bildnummer","Edition","Kartennummer","Sprache","Verlag","Erscheinungsjahr","Region","Seltenheit","Kartentyp","Subtyp","Farbe","Spezialeffekte","Limitierung","Autogramm","Memorabilia","Zustand","Ankaufspreis","Marktwert"
+]
+
+
+def _carddata_row(card: CardData, ankaufspreis_default: str) -> List[str]:
+    # image filename only (without path)
+    image_filename = os.path.basename(card.image_path) if getattr(card, 'image_path', None) else ''
+    return [
+        card.magazin_name or '',
+        str(card.magazin_index) or 1,
+        card.kartenname or '',
+        image_filename,
+        card.edition or '',
+        card.kartennummer or '',
+        card.sprache or '',
+        card.verlag or '',
+        card.erscheinungsjahr or '',
+        card.region or '',
+        card.seltenheit or '',
+        card.kartentyp or '',
+        card.subtyp or '',
+        card.farbe or '',
+        card.spezialeffekte or '',
+        card.limitierung or '',
+        card.autogramm or '',
+        card.memorabilia or '',
+        card.zustand or '',
+        ankaufspreis_default,
+        card.marktwert or ''
+    ]
+
 
 def write_carddata_csv(cards: Iterable[CardData], csv_path: str, ankaufspreis_default: str = 'unbekannt') -> None:
     """Write an iterable of CardData objects to a semicolon-separated CSV.
@@ -11,38 +43,38 @@ def write_carddata_csv(cards: Iterable[CardData], csv_path: str, ankaufspreis_de
         csv_path: Destination file path to write the CSV to.
         ankaufspreis_default: Default value to place in the Ankaufspreis column when missing.
     """
-    header = [
-        "Fachbuchstabe","Fachnummer","Kartenname","Bildnummer","Edition","Kartennummer","Sprache","Verlag","Erscheinungsjahr","Region","Seltenheit","Kartentyp","Subtyp","Farbe","Spezialeffekte","Limitierung","Autogramm","Memorabilia","Zustand","Ankaufspreis","Marktwert"
-    ]
-
     os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
 
     with open(csv_path, 'w', encoding='utf-8') as f:
-        f.write(';'.join(header) + '\n')
-        for card in cards:            
-            # image filename only (without path)
-            image_filename = os.path.basename(card.image_path) if getattr(card, 'image_path', None) else ''
-            row = [
-                card.magazin_name or '',
-                str(card.magazin_index) or 1,
-                card.kartenname or '',
-                image_filename,
-                card.edition or '',
-                card.kartennummer or '',
-                card.sprache or '',
-                card.verlag or '',
-                card.erscheinungsjahr or '',
-                card.region or '',
-                card.seltenheit or '',
-                card.kartentyp or '',
-                card.subtyp or '',
-                card.farbe or '',
-                card.spezialeffekte or '',
-                card.limitierung or '',
-                card.autogramm or '',
-                card.memorabilia or '',
-                card.zustand or '',
-                ankaufspreis_default,
-                card.marktwert or ''
-            ]
-            f.write(';'.join(row) + '\n')
+        f.write(';'.join(CSV_HEADER) + '\n')
+        for card in cards:
+            f.write(';'.join(_carddata_row(card, ankaufspreis_default)) + '\n')
+
+
+class CardCsvWriter:
+    """Appends CardData rows to a CSV one at a time, e.g. while a long batch is still running.
+
+    The header is only written if the file is new or empty, so an interrupted batch can continue the same file.
+    """
+
+    def __init__(self, csv_path: str, ankaufspreis_default: str = 'unbekannt'):
+        self.csv_path = csv_path
+        self.ankaufspreis_default = ankaufspreis_default
+        os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+        self._file = open(csv_path, 'a', encoding='utf-8')
+        if self._file.tell() == 0:
+            self._file.write(';'.join(CSV_HEADER) + '\n')
+            self._file.flush()
+
+    def write(self, card: CardData) -> None:
+        self._file.write(';'.join(_carddata_row(card, self.ankaufspreis_default)) + '\n')
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
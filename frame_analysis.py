@@ -0,0 +1,221 @@
+import os
+import math
+import time
+import logging
+from typing import List, Optional
+import numpy as np
+
+# === Default Configurable Constants ===
+DEFAULT_DOWNSAMPLE = 4  # Use every n-th pixel of the low-res frame
+DEFAULT_PRESENCE_THRESHOLD = 12.0  # Mean absolute grey level difference to the empty tray
+DEFAULT_SETTLE_DIFF_THRESHOLD = 1.5  # Mean absolute difference between consecutive frames of a resting card
+DEFAULT_SETTLE_MIN_SHARPNESS = 500.0  # Laplacian variance of the downsampled lores frame, samples/ give >1000 sharp, <350 blurred
+DEFAULT_SETTLE_TIMEOUT = 2.0  # Seconds, fallback if the image never gets stable and sharp
+DEFAULT_SETTLE_INTERVAL = 0.05  # Seconds between two low-res frames
+DEFAULT_QUALITY_MIN_SHARPNESS = 600.0  # Laplacian variance on the card, calibrate_quality.py: samples/ >1500 sharp, <300 blurred
+DEFAULT_QUALITY_MAX_GLARE = 0.03  # Fraction of the card covered by glare spots, samples/ 0% normally (also white printed cards), >8% with glare
+DEFAULT_QUALITY_MAX_SKEW = 6.0  # Degrees the card may be rotated, samples/ <3.5° lying straight, >10° skewed
+DEFAULT_MAX_CAPTURES = 3  # Captures per card until it is recognized despite blur
+OVEREXPOSED_LEVEL = 250
+GLARE_RADIUS = 5  # Pixels of the downsampled frame, a saturated pixel is glare if the square around it
+GLARE_MIN_COVERAGE = 0.95  # is saturated almost completely: white print (text, borders, sparkles) is too thin
+CARD_MASK_THRESHOLD = 30  # Grey level difference of a pixel to the background that counts as card
+# =====================================
+
+
+def to_gray(frame) -> np.ndarray:
+    """Convert a frame (2D grey / Y plane or 3D RGB array) to a 2D grey array."""
+    frame = np.asarray(frame)
+    if frame.ndim == 3:
+        return frame[..., :3].mean(axis=2).astype(np.uint8)
+    return frame
+
+
+def downsample(frame, factor=DEFAULT_DOWNSAMPLE) -> np.ndarray:
+    """Cheap downsampling by taking every `factor`-th pixel in both directions."""
+    return to_gray(frame)[::factor, ::factor]
+
+
+def mean_abs_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute grey level difference between two equally sized frames."""
+    return float(np.abs(a.astype(np.int16) - b.astype(np.int16)).mean())
+
+
+def sharpness(frame: np.ndarray) -> float:
+    """Variance of the Laplacian, higher is sharper"""
+    gray = to_gray(frame).astype(np.float32)
+    laplacian = (gray[1:-1, :-2] + gray[1:-1, 2:] + gray[:-2, 1:-1] + gray[2:, 1:-1]) - 4 * gray[1:-1, 1:-1]
+    return float(laplacian.var())
+
+
+def box_mean(values: np.ndarray, radius: int) -> np.ndarray:
+    """Mean over the (2*radius+1)² square around every pixel, from an integral image, edges repeated"""
+    size = 2 * radius + 1
+    integral = np.pad(values.astype(np.float32), radius, mode='edge').cumsum(axis=0).cumsum(axis=1)
+    integral = np.pad(integral, ((1, 0), (1, 0)))
+    return (integral[size:, size:] - integral[:-size, size:] - integral[size:, :-size] + integral[:-size, :-size]) / (size * size)
+
+
+def glare_map(gray: np.ndarray, radius=GLARE_RADIUS, min_coverage=GLARE_MIN_COVERAGE) -> np.ndarray:
+    """
+    Saturated pixels inside compact saturated spots, i.e. reflections of the lighting. A flat count of pixels
+    at OVEREXPOSED_LEVEL would also count white print, which is saturated as well but has detail next to it.
+    """
+    saturated = gray >= OVEREXPOSED_LEVEL
+    return saturated & (box_mean(saturated, radius) >= min_coverage)
+
+
+def wait_until_settled(grab_frame, diff_threshold=DEFAULT_SETTLE_DIFF_THRESHOLD, min_sharpness=DEFAULT_SETTLE_MIN_SHARPNESS,
+                       timeout=DEFAULT_SETTLE_TIMEOUT, interval=DEFAULT_SETTLE_INTERVAL, factor=DEFAULT_DOWNSAMPLE):
+    """
+    Poll low-res frames from `grab_frame()` until two consecutive frames barely differ (card stopped moving)
+    and the image is sharp, or until `timeout` seconds passed.
+    Returns (seconds waited, True if settled / False on timeout).
+    """
+    start = time.monotonic()
+    previous = downsample(grab_frame(), factor)
+    while time.monotonic() - start < timeout:
+        time.sleep(interval)
+        current = downsample(grab_frame(), factor)
+        if mean_abs_difference(current, previous) < diff_threshold and sharpness(current) >= min_sharpness:
+            return time.monotonic() - start, True
+        previous = current
+    return time.monotonic() - start, False
+
+
+class CardPresenceDetector:
+    """
+    Detects whether a card lies in the camera tray by comparing a low-res frame
+    against a reference frame of the empty tray.
+    The reference is stored as .npy so it survives restarts.
+    """
+
+    def __init__(self, reference_path=None, threshold=DEFAULT_PRESENCE_THRESHOLD, factor=DEFAULT_DOWNSAMPLE):
+        self.reference_path = reference_path
+        self.threshold = threshold
+        self.factor = factor
+        self._reference = None
+        if reference_path and os.path.exists(reference_path):
+            try:
+                self._reference = np.load(reference_path)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Could not load empty tray reference {reference_path}: {e}")
+
+    @property
+    def has_reference(self) -> bool:
+        return self._reference is not None
+
+    @property
+    def reference(self) -> Optional[np.ndarray]:
+        """Downsampled frame of the empty tray, None if not calibrated"""
+        return self._reference
+
+    def set_reference(self, frame) -> None:
+        """Store the given low-res frame of the empty tray as reference."""
+        self._reference = downsample(frame, self.factor)
+        if self.reference_path:
+            os.makedirs(os.path.dirname(self.reference_path) or '.', exist_ok=True)
+            np.save(self.reference_path, self._reference)
+
+    def difference(self, frame) -> float:
+        """Difference of the given frame to the empty tray reference."""
+        current = downsample(frame, self.factor)
+        if current.shape != self._reference.shape:
+            raise ValueError(f"Frame size {current.shape} does not match reference {self._reference.shape}")
+        return mean_abs_difference(current, self._reference)
+
+    def is_card_present(self, frame) -> bool:
+        """True if the frame differs enough from the empty tray. Without a reference we cannot decide and assume a card."""
+        if not self.has_reference:
+            return True
+        return self.difference(frame) > self.threshold
+
+
+class CaptureQuality:
+    """Quality scores of one capture, see CaptureQualityGate"""
+
+    def __init__(self, sharpness: float, glare: float, skew: Optional[float], problems: List[str]):
+        self.sharpness = sharpness
+        self.glare = glare  # fraction of the card washed out by glare spots
+        self.skew = skew  # degrees, None if no card outline was found
+        self.problems = problems  # e.g. ['unscharf', 'Reflexion'], empty if the capture is good
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    @property
+    def recapturable(self) -> bool:
+        """A new exposure can fix blur (vibration, focus), not a skewed card or a reflection of the static lighting"""
+        return 'unscharf' in self.problems
+
+    def __repr__(self):
+        skew = f"{self.skew:.1f}°" if self.skew is not None else "?"
+        return f"CaptureQuality(sharpness={self.sharpness:.0f}, glare={self.glare:.1%}, skew={skew}, problems={self.problems})"
+
+
+class CaptureQualityGate:
+    """
+    Scores a low-res frame of a capture before it is sent to the API: sharpness of the card, area washed out
+    by glare spots and rotation of the card. The card is separated from the tray by the empty tray reference of
+    `presence` if calibrated, otherwise by the grey level at the frame border.
+    Works on the downsampled frame, takes about a millisecond.
+    """
+
+    def __init__(self, presence: Optional[CardPresenceDetector] = None, min_sharpness=DEFAULT_QUALITY_MIN_SHARPNESS,
+                 max_glare=DEFAULT_QUALITY_MAX_GLARE, max_skew=DEFAULT_QUALITY_MAX_SKEW, factor=DEFAULT_DOWNSAMPLE):
+        self.presence = presence
+        self.min_sharpness = min_sharpness
+        self.max_glare = max_glare
+        self.max_skew = max_skew
+        self.factor = factor
+
+    def card_mask(self, gray: np.ndarray) -> np.ndarray:
+        """Boolean mask of the pixels belonging to the card"""
+        reference = self.presence.reference if self.presence is not None else None
+        if reference is not None and reference.shape == gray.shape:
+            background = reference.astype(np.int16)
+        else:
+            border = np.concatenate((gray[0], gray[-1], gray[1:-1, 0], gray[1:-1, -1]))
+            background = np.int16(np.median(border))
+        return np.abs(gray.astype(np.int16) - background) > CARD_MASK_THRESHOLD
+
+    @staticmethod
+    def skew_angle(mask: np.ndarray) -> Optional[float]:
+        """
+        Rotation of the card in degrees (0..45): median slope of its left and right outline over the middle
+        half of its rows. Holes in the mask (card areas looking like the tray) do not matter, only the outline.
+        """
+        rows = np.nonzero(mask.any(axis=1))[0]
+        if len(rows) < 16:
+            return None
+        rows = rows[len(rows) // 4:len(rows) * 3 // 4]  # the corners of a rotated card lie outside
+        band = mask[rows]
+        left = np.argmax(band, axis=1)
+        right = band.shape[1] - 1 - np.argmax(band[:, ::-1], axis=1)
+        step = max(1, len(rows) // 4)  # slope over a longer distance, less affected by the pixel grid
+        dy = rows[step:] - rows[:-step]
+        slopes = np.concatenate(((left[step:] - left[:-step]) / dy, (right[step:] - right[:-step]) / dy))
+        return abs(math.degrees(math.atan(float(np.median(slopes)))))
+
+    def assess(self, frame) -> CaptureQuality:
+        gray = downsample(frame, self.factor)
+        mask = self.card_mask(gray)
+        rows, cols = np.any(mask, axis=1), np.any(mask, axis=0)
+        if rows.any():
+            # Sharpness and glare only on the card, the plain tray around it would dilute both
+            top, bottom = np.argmax(rows), len(rows) - np.argmax(rows[::-1])
+            left, right = np.argmax(cols), len(cols) - np.argmax(cols[::-1])
+            card = gray[top:bottom, left:right]
+            glare = float(glare_map(card)[mask[top:bottom, left:right]].mean())
+        else:
+            card = gray
+            glare = float(glare_map(gray).mean())
+        quality = CaptureQuality(sharpness(card), glare, self.skew_angle(mask), [])
+        if quality.sharpness < self.min_sharpness:
+            quality.problems.append('unscharf')
+        if quality.glare > self.max_glare:
+            quality.problems.append('Reflexion')
+        if quality.skew is not None and quality.skew > self.max_skew:
+            quality.problems.append('schief')
+        return quality
@@ -1,42 +1,187 @@
+import io
 import os
-import requests
+import json
+import base64
+import threading
+from contextlib import contextmanager
+
+# === Default Configurable Constants ===
+DEFAULT_UPLOAD_MEMORY_BUDGET_MB = 128  # memory of uploads in flight at the same time, override with UPLOAD_MEMORY_BUDGET_MB
+ENCODE_CHUNK_SIZE = 3 * 64 * 1024  # bytes read and base64 encoded per step, a multiple of 3 so chunks concatenate
+# =====================================
+
+_IMAGE_PLACEHOLDER = "@@image-data@@"
+
+
+class UploadBudget:
+    """
+    Caps the memory held by uploads in flight at the same time, shared by all describers of the process,
+    so parallel uploads (bulk recognition, valuation next to a run) can not add up to more than the Pi has.
+    In-memory images count with their size, images streamed from a file with about one chunk.
+    An upload larger than the whole budget still goes, but only while nothing else is in flight.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def reserve(self, size: int):
+        size = min(size, self.limit_bytes)
+        with self._condition:
+            self._condition.wait_for(lambda: self.in_use + size <= self.limit_bytes)
+            self.in_use += size
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_use -= size
+                self._condition.notify_all()
+
+
+upload_budget = UploadBudget(int(float(os.getenv('UPLOAD_MEMORY_BUDGET_MB', DEFAULT_UPLOAD_MEMORY_BUDGET_MB)) * 1024 * 1024))
+
+
+class _ImageSource:
+    """Image given as file path, bytes-like buffer or binary file object, read in chunks without copying it whole"""
+
+    def __init__(self, image, mime_type=None):
+        self._image = image
+        self._start = 0  # position of a file object the image starts at, restored after every read
+        if isinstance(image, (str, os.PathLike)):
+            self.size = os.path.getsize(image)
+        elif isinstance(image, (bytes, bytearray, memoryview)):
+            self._image = memoryview(image).cast('B')
+            self.size = len(self._image)
+        else:
+            try:
+                self._start = image.tell()
+                self.size = image.seek(0, io.SEEK_END) - self._start
+                image.seek(self._start)
+            except (AttributeError, OSError):
+                # Not seekable: the length is needed up front for Content-Length, so buffer it once
+                self._image = memoryview(image.read()).cast('B')
+                self.size = len(self._image)
+        if self.size == 0:
+            raise ValueError("Image is empty (file object already read to the end?)")
+        self.mime_type = mime_type or self._detect_mime_type()
+
+    @property
+    def resident_size(self) -> int:
+        """Memory the upload keeps in use: the whole buffer for in-memory images, about one chunk when streaming a file"""
+        if isinstance(self._image, (memoryview, io.BytesIO)):
+            return self.size
+        return 2 * ENCODE_CHUNK_SIZE  # raw chunk and its base64 encoding
+
+    def _detect_mime_type(self) -> str:
+        if isinstance(self._image, (str, os.PathLike)):
+            ext = os.path.splitext(self._image)[1].lower()
+            return "image/png" if ext == ".png" else "image/jpeg"
+        if isinstance(self._image, memoryview):
+            head = bytes(self._image[:8])
+        else:
+            position = self._image.tell()
+            head = self._image.read(8)
+            self._image.seek(position)
+        return "image/png" if head.startswith(b"\x89PNG") else "image/jpeg"
+
+    def chunks(self):
+        if isinstance(self._image, memoryview):
+            for offset in range(0, self.size, ENCODE_CHUNK_SIZE):
+                yield self._image[offset:offset + ENCODE_CHUNK_SIZE]
+        elif isinstance(self._image, (str, os.PathLike)):
+            with open(self._image, "rb") as f:
+                yield from iter(lambda: f.read(ENCODE_CHUNK_SIZE), b"")
+        else:
+            # Always from the start, also when requests sends the body again, and leave the position as it was
+            # so a retry with the same file object uploads the image again instead of an empty one
+            self._image.seek(self._start)
+            try:
+                yield from iter(lambda: self._image.read(ENCODE_CHUNK_SIZE), b"")
+            finally:
+                self._image.seek(self._start)
+
+
+class _StreamingJsonBody:
+    """
+    Request body of an image request: the JSON around the image is serialized as usual, the base64 image data
+    is encoded chunk by chunk while requests sends it. Has a length, so requests sets Content-Length instead
+    of using chunked transfer encoding.
+    """
+
+    def __init__(self, data: dict, source: _ImageSource):
+        prefix, suffix = json.dumps(data).split(_IMAGE_PLACEHOLDER)
+        self._prefix = prefix.encode("utf-8")
+        self._suffix = suffix.encode("utf-8")
+        self._source = source
+
+    def __len__(self) -> int:
+        return len(self._prefix) + (self._source.size + 2) // 3 * 4 + len(self._suffix)
+
+    def __iter__(self):
+        yield self._prefix
+        pending = b""
+        for chunk in self._source.chunks():
+            if pending:
+                chunk = pending + chunk
+            # short reads (pipes, sockets) may end off a 3-byte boundary, padding must only come at the very end
+            cut = len(chunk) - len(chunk) % 3
+            pending = bytes(chunk[cut:])
+            if cut:
+                yield base64.b64encode(chunk[:cut])
+        if pending:
+            yield base64.b64encode(pending)
+        yield self._suffix
+
 
 class GeminiImageDescriber:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, budget=None):
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
         if not self.api_key:
             raise ValueError("Gemini API key must be provided via argument or GEMINI_API_KEY env variable.")
         # Updated endpoint as per official documentation
         self.api_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+        self.budget = budget or upload_budget
 
-    def describe_image(self, image_path, prompt="Describe this image."):
-        with open(image_path, "rb") as img_file:
-            img_bytes = img_file.read()
-        # Determine mime type based on file extension
-        ext = os.path.splitext(image_path)[1].lower()
-        if ext == ".png":
-            mime_type = "image/png"
-        else:
-            mime_type = "image/jpeg"
-        img_b64 = self._to_base64(img_bytes)
+    def describe_image(self, image, prompt="Describe this image.", generation_config=None, mime_type=None):
+        """
+        image: file path, bytes-like buffer or binary file object (e.g. io.BytesIO).
+        The image is base64 encoded while it is uploaded, no full copy of it is held in memory.
+        """
+        source = _ImageSource(image, mime_type)
+        parts = [
+            {"text": prompt},
+            {
+                "inlineData": {
+                    "mimeType": source.mime_type,
+                    "data": _IMAGE_PLACEHOLDER
+                }
+            }
+        ]
+        with self.budget.reserve(source.resident_size):
+            return self._generate(parts, generation_config, image=source)
+
+    def describe_text(self, prompt, generation_config=None):
+        """Text-only request, e.g. for follow-up questions about an already identified card"""
+        return self._generate([{"text": prompt}], generation_config)
+
+    def _generate(self, parts, generation_config=None, image=None):
         data = {
             "contents": [
                 {
-                    "parts": [
-                        {"text": prompt},
-                        {
-                            "inlineData": {
-                                "mimeType": mime_type,
-                                "data": img_b64
-                            }
-                        }
-                    ]
+                    "parts": parts
                 }
             ]
         }
+        if generation_config:
+            # e.g. {"responseMimeType": "application/json", "responseSchema": {...}} for structured output
+            data["generationConfig"] = generation_config
+        import requests  # imported on first request, keeps server startup fast
         headers = {"Content-Type": "application/json"}
         params = {"key": self.api_key}
-        response = requests.post(self.api_url, json=data, headers=headers, params=params)
+        body = _StreamingJsonBody(data, image) if image is not None else json.dumps(data).encode("utf-8")
+        response = requests.post(self.api_url, data=body, headers=headers, params=params)
         response.raise_for_status()
         result = response.json()
         # Defensive: check for candidates and structure
@@ -45,11 +190,6 @@ class GeminiImageDescriber:
         except (KeyError, IndexError):
             raise RuntimeError(f"Unexpected API response: {result}")
 
-    @staticmethod
-    def _to_base64(binary_data):
-        import base64
-        return base64.b64encode(binary_data).decode("utf-8")
-
 # Example usage:
 # describer = GeminiImageDescriber()
 # description = describer.describe_image("samples/test.jpg", prompt="Describe the game card in detail.")
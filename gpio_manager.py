@@ -5,18 +5,31 @@ class GpioManager:
     """
     Manages GPIO access with optional mock mode for development/testing.
     Use MOCK_HARDWARE=1 environment variable to enable mock mode.
+    RPi.GPIO is only probed on first use, so importing this module stays cheap.
     """
     
     def __init__(self):
+        self._initialized = False
         self._mock_mode = bool(os.getenv('MOCK_HARDWARE'))
-        self._gpio = None
-        if not self._mock_mode:
-            try:
-                import RPi.GPIO as GPIO
-                self._gpio = GPIO
-            except ImportError:
-                print("Warning: RPi.GPIO not available, falling back to mock mode")
-                self._mock_mode = True
+        self._gpio_module = None
+
+    @property
+    def _gpio(self):
+        """The RPi.GPIO module, None in mock mode"""
+        if not self._initialized:
+            self._initialized = True
+            if not self._mock_mode:
+                try:
+                    import RPi.GPIO as GPIO
+                    self._gpio_module = GPIO
+                except ImportError:
+                    print("Warning: RPi.GPIO not available, falling back to mock mode")
+                    self._mock_mode = True
+        return self._gpio_module
+
+    @property
+    def mock_mode(self) -> bool:
+        return self._gpio is None
     
     @property
     def BCM(self) -> int:
@@ -45,17 +58,17 @@ class GpioManager:
     
     def setmode(self, mode: int) -> None:
         """Set the pin numbering mode"""
-        if not self._mock_mode:
+        if not self.mock_mode:
             self._gpio.setmode(mode)
     
     def setup(self, pin: int, mode: int) -> None:
         """Set up a GPIO pin"""
-        if not self._mock_mode:
+        if not self.mock_mode:
             self._gpio.setup(pin, mode)
     
     def input(self, pin: int) -> int:
         """Read from a GPIO pin"""
-        if self._mock_mode:
+        if self.mock_mode:
             # In mock mode, simulate the home sensor by returning HIGH
             # after a few reads to simulate finding home
             if not hasattr(self, '_mock_reads'):
@@ -66,12 +79,12 @@ class GpioManager:
     
     def output(self, pin: int, value: int) -> None:
         """Write to a GPIO pin"""
-        if not self._mock_mode:
+        if not self.mock_mode:
             self._gpio.output(pin, value)
     
     def cleanup(self) -> None:
         """Clean up GPIO resources"""
-        if not self._mock_mode and self._gpio:
+        if not self.mock_mode:
             self._gpio.cleanup()
 
 # Global instance
@@ -0,0 +1,288 @@
+"""
+Runs the hardware (ProcessController with motors, camera and GPIO) in its own process with elevated
+scheduling priority, so load in the web server (JSON, WebSockets, CSV export) can not disturb step timing.
+
+The web process talks to it through HardwareClient, which mirrors the ProcessController interface used by
+ProcessManager. Commands go through one multiprocessing queue, cards, valuations, status updates and
+replies come back through another.
+"""
+import os
+import queue
+import itertools
+import threading
+import multiprocessing
+from typing import Callable, Dict, Optional
+from carddata import CardData
+
+# === Default Configurable Constants ===
+DEFAULT_RT_PRIORITY = 10  # SCHED_FIFO priority of the runner process, falls back to nice if not permitted
+DEFAULT_NICE_INCREMENT = -10
+STATUS_INTERVAL = 0.2  # seconds between status updates while idle or running
+REQUEST_TIMEOUT = 60.0  # seconds to wait for replies of short commands (calibrate, warm-up, start)
+# =====================================
+
+
+def _raise_priority() -> None:
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(DEFAULT_RT_PRIORITY))
+        print(f"Hardware runner: SCHED_FIFO priority {DEFAULT_RT_PRIORITY}")
+        return
+    except (AttributeError, PermissionError, OSError) as e:
+        print(f"Hardware runner: SCHED_FIFO not available ({e}), trying nice")
+    try:
+        os.nice(DEFAULT_NICE_INCREMENT)
+        print(f"Hardware runner: nice {DEFAULT_NICE_INCREMENT}")
+    except (AttributeError, PermissionError, OSError) as e:
+        print(f"Hardware runner: Could not raise priority ({e}), running with normal priority")
+
+
+def runner_main(commands: multiprocessing.Queue, events: multiprocessing.Queue) -> None:
+    """Entry point of the runner process"""
+    _raise_priority()
+    from gpio_manager import gpio
+    from process_control import ProcessController
+    gpio.setmode(gpio.BCM)
+    controller = ProcessController()
+    controller.on_card_processed = lambda card, position: events.put(('card', card.to_dict(), position))
+    controller.on_card_valued = lambda card: events.put(('valued', card.image_path, card.marktwert))
+
+    def publish_status():
+        events.put(('status', {
+            'running': controller.is_running(),
+            'current_position': controller.current_position,
+            'magazin_name': controller.magazin_name,
+            'magazine_size': controller.magazine_size,
+            'paused_reason': controller.paused_reason,
+            'has_reference': controller.presence.has_reference,
+            'pending_valuations': controller.pending_valuations,
+            'recognition_stats': controller.recognition_stats(),
+        }))
+
+    handlers: Dict[str, Callable] = {
+        'start': lambda kwargs: controller.start_async(**kwargs) and None,
+        'stop': lambda emergency: controller.stop(emergency=emergency),
+        'home': lambda: controller.move_magazine_to_home(),
+        'calibrate': lambda: controller.calibrate_empty_tray(),
+        'warm_up': lambda: controller.warm_up(),
+        'set_state': lambda name, value: setattr(controller, name, value),
+        'valuate': lambda card_data: controller.submit_valuation(CardData.from_dict(card_data)),
+    }
+    publish_status()
+    parent = multiprocessing.parent_process()
+    while True:
+        if parent is not None and not parent.is_alive():
+            # The web process crashed or was killed: cards could not be journaled any more, and a restarted
+            # server would start a second runner on the same pins. Stop the motors and exit.
+            print("Hardware runner: Web process gone, stopping motors and exiting")
+            controller.stop(emergency=True)
+            events.cancel_join_thread()  # nobody reads the events any more, do not block on exit
+            break
+        try:
+            command, request_id, args = commands.get(timeout=STATUS_INTERVAL)
+        except queue.Empty:
+            publish_status()
+            continue
+        if command == 'shutdown':
+            controller.stop(emergency=True)
+            break
+        try:
+            result, error = handlers[command](*args), None
+        except Exception as e:
+            result, error = None, str(e)
+        if request_id is not None:
+            events.put(('reply', request_id, result, error))
+        publish_status()
+
+
+class HardwareClient:
+    """
+    Web process side of the hardware runner. Provides the parts of the ProcessController interface
+    ProcessManager uses; state is mirrored from the status updates of the runner.
+    """
+
+    def __init__(self):
+        self._context = multiprocessing.get_context('spawn')  # no fork of the threaded web server
+        self._commands = None
+        self._events = None
+        self._process = None
+        self._request_ids = itertools.count()
+        self._replies: Dict[int, list] = {}  # request id -> [threading.Event, result, error]
+        self._replies_lock = threading.Lock()
+        self._status: dict = {}
+        self._cleared_paused_reason = None  # cleared on the web side, ignored in status updates until the runner confirms
+        self._valuation_pending: Dict[str, CardData] = {}  # image_path -> card object stored in the web process
+        self.on_card_processed = None  # Callback(card: CardData, position: int)
+        self.on_card_valued = None  # Callback(card: CardData)
+        self.on_runner_restarted = None  # Callback() after a crashed runner was replaced, the magazine must be homed again
+        self._start_process()
+
+    def _start_process(self) -> None:
+        self._commands = self._context.Queue()
+        self._events = self._context.Queue()
+        self._process = self._context.Process(target=runner_main, args=(self._commands, self._events), name='hardware-runner', daemon=True)
+        self._process.start()
+        threading.Thread(target=self._listen, args=(self._events,), daemon=True, name='hardware-events').start()
+        print(f"Hardware runner started (pid {self._process.pid})")
+
+    def _ensure_process(self) -> None:
+        """
+        Restart the runner if it died, restoring magazine name and position and resubmitting the valuations that
+        were in flight in the dead runner. The new ProcessController does not know where the magazine physically
+        is, on_runner_restarted lets the owner home it before the next run.
+        """
+        if self._process.is_alive():
+            return
+        print(f"Hardware runner exited with code {self._process.exitcode}, restarting")
+        status = self._status
+        self._status = {}
+        self._start_process()
+        if 'magazine_size' in status:
+            self._status['magazine_size'] = status['magazine_size']  # fixed, until the new runner reports it
+        for name in ('current_position', 'magazin_name'):
+            if name in status:
+                self._status[name] = status[name]
+                self._send('set_state', name, status[name])
+        for card in list(self._valuation_pending.values()):
+            self._send('valuate', card.to_dict())
+        if self.on_runner_restarted:
+            self.on_runner_restarted()
+
+    def ensure_running(self) -> None:
+        """Restart the runner now if it died, instead of on the next command"""
+        self._ensure_process()
+
+    def _listen(self, events: multiprocessing.Queue) -> None:
+        while True:
+            event = events.get()
+            kind = event[0]
+            try:
+                if kind == 'status':
+                    status = event[1]
+                    if status.get('paused_reason') is None:
+                        self._cleared_paused_reason = None  # the runner processed the clear
+                    elif status['paused_reason'] == self._cleared_paused_reason:
+                        status['paused_reason'] = None  # sent before the clear arrived
+                    self._status = status
+                elif kind == 'card':
+                    card = CardData.from_dict(event[1])
+                    self._valuation_pending[card.image_path] = card
+                    if self.on_card_processed:
+                        self.on_card_processed(card, event[2])
+                elif kind == 'valued':
+                    card = self._valuation_pending.pop(event[1], None)
+                    if card is not None:
+                        card.marktwert = event[2]
+                        if self.on_card_valued:
+                            self.on_card_valued(card)
+                elif kind == 'reply':
+                    with self._replies_lock:
+                        reply = self._replies.get(event[1])
+                    if reply:
+                        reply[1:] = [event[2], event[3]]
+                        reply[0].set()
+            except Exception as e:
+                print(f"Hardware runner: Error handling {kind} event: {e}")
+
+    def _send(self, command: str, *args) -> None:
+        self._commands.put((command, None, args))
+
+    def _request(self, command: str, *args, timeout: Optional[float] = REQUEST_TIMEOUT):
+        """Send a command and wait for the runner's reply, errors are raised as RuntimeError"""
+        self._ensure_process()
+        request_id = next(self._request_ids)
+        reply = [threading.Event(), None, None]
+        with self._replies_lock:
+            self._replies[request_id] = reply
+        try:
+            self._commands.put((command, request_id, args))
+            waited = 0.0
+            while not reply[0].wait(STATUS_INTERVAL):
+                waited += STATUS_INTERVAL
+                if not self._process.is_alive():
+                    raise RuntimeError(f"Hardware runner exited while handling {command}")
+                if timeout is not None and waited >= timeout:
+                    raise RuntimeError(f"Hardware runner did not answer {command}")
+        finally:
+            with self._replies_lock:
+                self._replies.pop(request_id, None)
+        if reply[2] is not None:
+            raise RuntimeError(reply[2])
+        return reply[1]
+
+    # --- ProcessController interface ---
+    def is_running(self) -> bool:
+        return bool(self._status.get('running')) and self._process.is_alive()
+
+    @property
+    def magazine_size(self) -> int:
+        return self._status.get('magazine_size', 0)
+
+    @property
+    def current_position(self) -> int:
+        return self._status.get('current_position', 0)
+
+    @current_position.setter
+    def current_position(self, value: int) -> None:
+        self._status['current_position'] = value
+        self._request('set_state', 'current_position', value)
+
+    @property
+    def magazin_name(self) -> Optional[str]:
+        return self._status.get('magazin_name')
+
+    @magazin_name.setter
+    def magazin_name(self, value: Optional[str]) -> None:
+        self._status['magazin_name'] = value
+        self._request('set_state', 'magazin_name', value)
+
+    @property
+    def paused_reason(self) -> Optional[str]:
+        return self._status.get('paused_reason')
+
+    @paused_reason.setter
+    def paused_reason(self, value: Optional[str]) -> None:
+        # Called from the status broadcast on the event loop: never wait for the runner here
+        if value is None:
+            self._cleared_paused_reason = self._status.get('paused_reason')
+        self._status['paused_reason'] = value
+        self._send('set_state', 'paused_reason', value)
+
+    @property
+    def has_reference(self) -> Optional[bool]:
+        """Whether the empty tray is calibrated, None until the runner reported it"""
+        return self._status.get('has_reference')
+
+    @property
+    def pending_valuations(self) -> int:
+        return self._status.get('pending_valuations', 0)
+
+    def recognition_stats(self) -> dict:
+        return self._status.get('recognition_stats', {})
+
+    def move_magazine_to_home(self) -> None:
+        self._request('home', timeout=None)  # homing may take a while, the old in-process call blocked as well
+
+    def calibrate_empty_tray(self) -> None:
+        self._request('calibrate')
+
+    def warm_up(self) -> dict:
+        return self._request('warm_up')
+
+    def submit_valuation(self, card: CardData) -> None:
+        self._valuation_pending[card.image_path] = card
+        self._send('valuate', card.to_dict())
+
+    def start_async(self, home_magazine=False, start_index=1, magazin_name=None) -> None:
+        self._request('start', {'home_magazine': home_magazine, 'start_index': start_index, 'magazin_name': magazin_name})
+        self._status['magazin_name'] = magazin_name
+        self._status['running'] = True  # until the next status update arrives
+
+    def stop(self, emergency=False) -> None:
+        # Nothing runs in a dead runner, restarting it here would only lose the homing state
+        if self._process.is_alive():
+            self._send('stop', emergency)
+
+    def shutdown(self) -> None:
+        if self._process.is_alive():
+            self._send('shutdown')
+            self._process.join(timeout=5)
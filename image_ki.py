@@ -1,49 +1,143 @@
+import json
+import threading
 from gemini_request import GeminiImageDescriber
-from carddata import CardData
-import re
+from carddata import CardData, CARD_FIELDS
+
+UNKNOWN = 'unbekannt'
+PENDING = 'ausstehend'  # marktwert until the background valuation (see valuation.py) is done
+DEFAULT_MAX_RETRIES = 2
+
+# Fields needed right away while the card is in the machine, the market value is determined later
+IDENTIFICATION_FIELDS = tuple(field for field in CARD_FIELDS if field != 'marktwert')
+
+# Short hints per field, the field names themselves come from the response schema
+FIELD_HINTS = {
+    'kartenname': "offizieller Name der Karte",
+    'edition': "Serie/Set",
+    'kartennummer': "Nummer innerhalb der Edition, ggf. aus eBay/Cardmarket ermitteln. Nummern mit Schrägstrich sind Limitierungsnummern, ignorieren",
+    'sprache': "Drucksprache",
+    'verlag': "Herausgeber",
+    'erscheinungsjahr': "Jahr der Veröffentlichung, ggf. über Kartenname und Edition ermitteln",
+    'region': "Hauptverbreitungsgebiet",
+    'seltenheit': "z.B. häufig, selten, ultra-selten",
+    'kartentyp': "z.B. Kreatur, Zauber, Land",
+    'subtyp': "genauere Klassifikation innerhalb des Kartentyps",
+    'farbe': "z.B. Rot, Blau, Mehrfarbig",
+    'spezialeffekte': "z.B. Hologramm, Glitzer",
+    'limitierung': "z.B. Promo, Sonderedition, Nummer in Klammern, z.B. \"Promo (23/100)\"",
+    'autogramm': "Autogramm eines Künstlers oder Spielers?",
+    'memorabilia': "enthält ein echtes Stück (z.B. Trikotstoff)?",
+    'zustand': "Skala: Perfekt, Booster Frisch, Leichte Gebrauchspuren, Sichtbare Abnutzung, Starke Abnutzung, Beschädigt, Kaputt. Auf Kratzer, Knicke, Abnutzung achten",
+}
+
+
+def build_prompt(fields) -> str:
+    """Compact prompt asking for the given fields, the output format is enforced via the response schema"""
+    hints = "\n".join(f"- {field}: {FIELD_HINTS[field]}" for field in fields)
+    return (
+        "Erkenne die Sammelkarte auf dem Bild und fülle die Felder aus. "
+        "Nutze auch dein Wissen oder das Internet. Unsichere Felder mit \"unbekannt\" füllen.\n" + hints
+    )
+
+
+def build_schema(fields) -> dict:
+    """Gemini response schema: one string property per field, all required"""
+    return {
+        "type": "OBJECT",
+        "properties": {field: {"type": "STRING"} for field in fields},
+        "required": list(fields),
+        "propertyOrdering": list(fields),
+    }
+
+
+class RecognitionStats:
+    """Thread-safe counters to monitor parse failures and retries of the recognition"""
 
-class CardRecognizer:
     def __init__(self):
-        self.prompt = """
-        Wir benötigen einen CSV-Eintrag für eine Sammelkarte. 
-        Basierern sollte es auf dem Bild der Karte, du kannst aber auch weitere Informationen aus deinem Wissen oder dem Internet hinzuziehen, um die Felder bestmöglich auszufüllen.
-
-        Der Eintrag sollte folgendes Format haben:
-        Kartenname;Edition;Kartennummer;Sprache;Verlag;Erscheinungsjahr;Region;Seltenheit;Kartentyp;Subtyp;Farbe;Spezialeffekte;Limitierung;Autogramm;Memorabilia;Zustand;Marktwert
-
-        Hinweise zu den einzelnen Feldern:
-        - Kartenname: Der offizielle Name der Karte.
-        - Edition: Die Serie oder das Set, zu dem die Karte gehört.
-        - Kartennummer: Die Nummer der Karte innerhalb der Edition. Wenn nicht vorhanden, dann versuche die Kartenummer aus deinem Wissen oder dem Internet (ebay oder cardmarket) zu ermitteln. Wenn die Kartennummer einen Schrägstrich enthält, dann ist sie eine Limiterungsnummer und keine Kartennummer. Ignoriere solche Nummern.
-        - Sprache: Die Sprache, in der die Karte gedruckt ist.
-        - Verlag: Der Herausgeber der Karte.
-        - Erscheinungsjahr: Das Jahr, in dem die Karte veröffentlicht wurde. Wenn nicht vorhanden, dann versuche das Erscheinungsjahr aus deinem Wissen oder dem Internet (ebay oder cardmarket) zu ermitteln, mit Hilfe des Kartennamen und der Edition.
-        - Region: Das geografische Gebiet, in dem die Karte hauptsächlich verwendet wird.
-        - Seltenheit: Die Seltenheitsstufe der Karte (z.B. häufig, selten, ultra-selten).
-        - Kartentyp: Die Kategorie der Karte (z.B Kreatur, Zauber, Land).
-        - Subtyp: Eine spezifischere Klassifikation innerhalb des Kartentyps.
-        - Farbe: Die Farbe(n) der Karte (z.B. Rot, Blau, Mehrfarbig).
-        - Spezialeffekte: Besondere Merkmale wie Hologramm, Glitzer, etc.
-        - Limitierung: Ob die Karte limitiert ist (z.B. Promo, Sonderedition). Wenn vorhanden, gebe die Nummer der Limitierung in Klammern an. Zum Beispiel "Promo (23/100)".
-        - Autogramm: Ob die Karte ein Autogramm eines Künstlers oder Spielers hat.
-        - Memorabilia: Ob die Karte ein Stück von etwas Echtem (z.B. Stoff von einem Kostüm) enthält.
-        - Zustand: Der physische Zustand der Karte (Nutze diese Skala: Perfekt, Booster Frisch, Leichte Gebrauchspuren, Sichtbare Abnutzung, Starke Abnutzung, Beschädigt, Kaputt). Achte auf Beschädigungen wie Kratzer, Knicke, Abnutzung.
-        - Marktwert: Der aktuelle geschätzte Marktwert der Karte basierend auf Verkaufsdaten auf Plattformen wie eBay, TCGPlayer, Cardmarket, etc. Beziehe den Zustand der Karte in deine Bewertung mit ein, ziehe pro Stufe 14,28%% ab. Gib den Wert mit Währung an. 
-
-        Bitte fülle Felder aus, bei denen du unsicher bist oder keine Information hast, mit "unbekannt" aus. 
-        Geben nur den CSV-Eintrag zurück, ohne zusätzliche Erklärungen oder Text. Gib nicht das definierte CSV-Format zurück, nur den CSV-Eintrag. 
-        Verwende in den Felder keine Semikolons. 
-        """
-        self.describer = GeminiImageDescriber()
-    def recognize(self, image_path):
-        description = self.describer.describe_image(image_path, prompt=self.prompt)
+        self._lock = threading.Lock()
+        self.cards = 0
+        self.requests = 0
+        self.parse_failures = 0  # responses that were no valid JSON object
+        self.invalid_fields = 0  # fields missing or empty in an otherwise valid response
+        self.retries = 0
+        self.cards_with_retry = 0
+        self.unresolved_fields = 0  # fields still invalid after all retries, filled with 'unbekannt'
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "cards": self.cards,
+                "requests": self.requests,
+                "parse_failures": self.parse_failures,
+                "invalid_fields": self.invalid_fields,
+                "retries": self.retries,
+                "cards_with_retry": self.cards_with_retry,
+                "unresolved_fields": self.unresolved_fields,
+                "parse_failure_rate": self.parse_failures / self.requests if self.requests else 0.0,
+                "retry_rate": self.cards_with_retry / self.cards if self.cards else 0.0,
+            }
+
+
+class CardRecognizer:
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES):
+        self.max_retries = max_retries
+        self.prompt = build_prompt(IDENTIFICATION_FIELDS)
+        self.stats = RecognitionStats()
+        self._describer = None
+
+    @property
+    def describer(self) -> GeminiImageDescriber:
+        """API client, created on first use (raises ValueError without API key)"""
+        if self._describer is None:
+            self._describer = GeminiImageDescriber()
+        return self._describer
+
+    def _request_fields(self, image_path, fields):
+        """Request the given fields as JSON. Returns (valid values, invalid field names)."""
+        prompt = self.prompt if tuple(fields) == IDENTIFICATION_FIELDS else build_prompt(fields)
+        generation_config = {"responseMimeType": "application/json", "responseSchema": build_schema(fields)}
+        self.stats.add(requests=1)
+        description = self.describer.describe_image(image_path, prompt=prompt, generation_config=generation_config)
         print("GeminiImageDescriber: Return: " + str(description))
-        # Parse CSV string into CardData
-        fields = re.split(r';', description.strip())
-        # Pad missing fields with 'unbekannt'
-        while len(fields) < 17:
-            fields.append('unbekannt')
-        return CardData(image_path, *fields[:17])
+        try:
+            result = json.loads(description)
+        except json.JSONDecodeError:
+            result = None
+        if not isinstance(result, dict):
+            self.stats.add(parse_failures=1)
+            return {}, list(fields)
+        values = {}
+        invalid = []
+        for field in fields:
+            value = result.get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            if isinstance(value, str) and value.strip():
+                # The CSV export is semicolon separated
+                values[field] = value.strip().replace(';', ',')
+            else:
+                invalid.append(field)
+        self.stats.add(invalid_fields=len(invalid))
+        return values, invalid
+
+    def recognize(self, image_path):
+        """Identify the card on the image. marktwert stays PENDING, see CardValuator."""
+        values, invalid = self._request_fields(image_path, IDENTIFICATION_FIELDS)
+        retries = 0
+        # Only ask again for the fields that could not be validated
+        while invalid and retries < self.max_retries:
+            retries += 1
+            print(f"CardRecognizer: Retry {retries} for fields {invalid}")
+            retry_values, invalid = self._request_fields(image_path, invalid)
+            values.update(retry_values)
+        self.stats.add(cards=1, retries=retries, cards_with_retry=1 if retries else 0, unresolved_fields=len(invalid))
+        values['marktwert'] = PENDING
+        return CardData(image_path, *(values.get(field, UNKNOWN) for field in CARD_FIELDS))
 
 # Example usage:
 # recognizer = CardRecognizer()
@@ -0,0 +1,126 @@
+import bisect
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from carddata import CardData
+from card_values import ZUSTAND_SCALE
+
+
+class ValueAggregate:
+    """Count, value total/median per currency and condition distribution of a group of cards, updated incrementally"""
+
+    def __init__(self):
+        self.count = 0
+        self._values: Dict[str, List[float]] = {}  # currency -> sorted values, gives the median in O(1)
+        self._totals: Dict[str, float] = {}
+        self._conditions = Counter()
+
+    def add(self, card: CardData) -> None:
+        self.count += 1
+        self._conditions[card.zustand_stufe] += 1
+        self.add_value(card.marktwert_wert, card.marktwert_waehrung)
+
+    def add_all(self, cards: Iterable[CardData]) -> None:
+        """Add many cards at once, sorting each value list once instead of inserting value by value"""
+        touched = set()
+        for card in cards:
+            self.count += 1
+            self._conditions[card.zustand_stufe] += 1
+            if card.marktwert_wert is not None:
+                currency = card.marktwert_waehrung
+                self._values.setdefault(currency, []).append(card.marktwert_wert)
+                self._totals[currency] = self._totals.get(currency, 0.0) + card.marktwert_wert
+                touched.add(currency)
+        for currency in touched:
+            self._values[currency].sort()
+
+    def add_value(self, value: Optional[float], currency: Optional[str]) -> None:
+        if value is None:
+            return
+        bisect.insort(self._values.setdefault(currency, []), value)
+        self._totals[currency] = self._totals.get(currency, 0.0) + value
+
+    def remove_value(self, value: Optional[float], currency: Optional[str]) -> None:
+        if value is None:
+            return
+        values = self._values[currency]
+        del values[bisect.bisect_left(values, value)]
+        self._totals[currency] -= value
+
+    @staticmethod
+    def _median(values: List[float]) -> float:
+        middle = len(values) // 2
+        return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "valued_count": sum(len(values) for values in self._values.values()),
+            "total_value": {currency: round(total, 2) for currency, total in self._totals.items() if self._values[currency]},
+            "median_value": {currency: self._median(values) for currency, values in self._values.items() if values},
+            "condition_distribution": {
+                (ZUSTAND_SCALE[stufe] if stufe is not None else 'unbekannt'): count
+                for stufe, count in sorted(self._conditions.items(), key=lambda item: (item[0] is None, item[0] or 0))
+            },
+        }
+
+
+class InventoryAggregates:
+    """
+    Aggregates over all processed cards, per magazine and per run.
+    Cards must be normalized (see card_values.normalize_card) before they are added.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = ValueAggregate()
+        self.by_magazine: Dict[str, ValueAggregate] = {}
+        self.by_run: Dict[int, ValueAggregate] = {}
+
+    def _groups(self, card: CardData) -> List[ValueAggregate]:
+        groups = [self.total, self.by_magazine.setdefault(card.magazin_name, ValueAggregate())]
+        if card.run_id is not None:
+            groups.append(self.by_run.setdefault(card.run_id, ValueAggregate()))
+        return groups
+
+    def add(self, card: CardData) -> None:
+        with self._lock:
+            for group in self._groups(card):
+                group.add(card)
+
+    def add_all(self, cards: Iterable[CardData]) -> None:
+        """Add many cards at once, e.g. all cards restored from the journal"""
+        cards = list(cards)
+        by_magazine: Dict[str, List[CardData]] = {}
+        by_run: Dict[int, List[CardData]] = {}
+        for card in cards:
+            by_magazine.setdefault(card.magazin_name, []).append(card)
+            if card.run_id is not None:
+                by_run.setdefault(card.run_id, []).append(card)
+        with self._lock:
+            self.total.add_all(cards)
+            for name, group_cards in by_magazine.items():
+                self.by_magazine.setdefault(name, ValueAggregate()).add_all(group_cards)
+            for run_id, group_cards in by_run.items():
+                self.by_run.setdefault(run_id, ValueAggregate()).add_all(group_cards)
+
+    def update_value(self, card: CardData, old_value: Tuple[Optional[float], Optional[str]]) -> None:
+        """The market value of an already added card changed from old_value (value, currency) to the card's current one"""
+        with self._lock:
+            for group in self._groups(card):
+                group.remove_value(*old_value)
+                group.add_value(card.marktwert_wert, card.marktwert_waehrung)
+
+    def as_dict(self, magazin_name: Optional[str] = None, run_id: Optional[int] = None) -> dict:
+        with self._lock:
+            if magazin_name is not None:
+                group = self.by_magazine.get(magazin_name)
+                return group.as_dict() if group else ValueAggregate().as_dict()
+            if run_id is not None:
+                group = self.by_run.get(run_id)
+                return group.as_dict() if group else ValueAggregate().as_dict()
+            return {
+                "total": self.total.as_dict(),
+                "magazines": {name: group.as_dict() for name, group in sorted(self.by_magazine.items(), key=lambda item: str(item[0]))},
+                "runs": {run: group.as_dict() for run, group in sorted(self.by_run.items())},
+            }
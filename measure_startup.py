@@ -0,0 +1,78 @@
+"""
+Measures how fast the web server comes up:
+- time to import web_api (in a fresh interpreter)
+- time from launching uvicorn until the first HTTP response
+- time until the background warm-up (journal replay, hardware and API clients) finished
+
+Usage: python measure_startup.py [--port 8765] [--runs 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+import urllib.error
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import web_api; print(time.perf_counter() - t)"
+
+
+def measure_import() -> float:
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], stderr=subprocess.DEVNULL, text=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=1) as response:
+        return json.loads(response.read())
+
+
+def measure_server(port: int, timeout: float = 30.0):
+    """Returns (seconds until first response, seconds until warm-up finished or None)"""
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "web_api:app", "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    first_response = None
+    warmed_up = None
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                status = get_json(f"{base_url}/system/warm-up")
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                time.sleep(0.01)
+                continue
+            if first_response is None:
+                first_response = time.perf_counter() - start
+            # warm-up reports the journal and all four subsystems once done
+            if len(status) >= 5:
+                warmed_up = time.perf_counter() - start
+                print(f"  warm-up: {status}")
+                break
+            time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait()
+    return first_response, warmed_up
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure web server startup time")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    for run in range(1, args.runs + 1):
+        import_time = measure_import()
+        first_response, warmed_up = measure_server(args.port)
+        first_text = f"{first_response:.3f}s" if first_response is not None else "timeout"
+        warm_text = f"{warmed_up:.3f}s" if warmed_up is not None else "not finished"
+        print(f"Run {run}: import web_api {import_time:.3f}s, first response {first_text}, warm-up done {warm_text}")
+
+
+if __name__ == "__main__":
+    main()
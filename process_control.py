@@ -1,8 +1,11 @@
 import time
 import os
+import threading
 from motor import MotorController, Motor, Direction
 from camera import create_camera
+from frame_analysis import CardPresenceDetector, CaptureQualityGate, DEFAULT_PRESENCE_THRESHOLD, DEFAULT_MAX_CAPTURES
 from image_ki import CardRecognizer
+from valuation import CardValuator
 from carddata import CardData
 from csv_out import write_carddata_csv
 from gpio_manager import gpio  # Use our GPIO manager instead of direct RPi.GPIO
@@ -16,10 +19,11 @@ DEFAULT_IMAGE_DIR = "images"
 DEFAULT_MAGAZIN_NAME = 'A'
 DEFAULT_MOTOR_PINS = {'X_STEP': 17, 'X_DIR': 27, 'Z_STEP': 24, 'Z_DIR': 25, 'EN': 4}
 DEFAULT_HOME_SENSOR_PIN = 21
+DEFAULT_EMPTY_TRAY_REFERENCE = "empty_tray.npy"  # stored inside image_dir
 # =====================================
 
 class ProcessController:
-    def __init__(self, magazine_size=DEFAULT_MAGAZINE_SIZE, separate_steps=DEFAULT_SEPARATE_STEPS, output_steps=DEFAULT_OUTPUT_STEPS, magazine_move_steps=DEFAULT_MAGAZINE_MOVE_STEPS, image_dir=DEFAULT_IMAGE_DIR, magazin_name=DEFAULT_MAGAZIN_NAME, motor_pins=None, home_sensor_pin=DEFAULT_HOME_SENSOR_PIN):
+    def __init__(self, magazine_size=DEFAULT_MAGAZINE_SIZE, separate_steps=DEFAULT_SEPARATE_STEPS, output_steps=DEFAULT_OUTPUT_STEPS, magazine_move_steps=DEFAULT_MAGAZINE_MOVE_STEPS, image_dir=DEFAULT_IMAGE_DIR, magazin_name=DEFAULT_MAGAZIN_NAME, motor_pins=None, home_sensor_pin=DEFAULT_HOME_SENSOR_PIN, presence_threshold=DEFAULT_PRESENCE_THRESHOLD, max_captures=DEFAULT_MAX_CAPTURES):
         self.magazine_size = magazine_size
         self.separate_steps = separate_steps
         self.output_steps = output_steps
@@ -30,15 +34,29 @@ class ProcessController:
         if motor_pins is None:
             motor_pins = DEFAULT_MOTOR_PINS
         self.motor = MotorController(motor_pins['X_STEP'], motor_pins['X_DIR'], motor_pins['Z_STEP'], motor_pins['Z_DIR'], motor_pins['EN'])
-        self.camera = create_camera()
+        self._camera = None  # created on first use, see camera property
         self.recognizer = CardRecognizer()
+        self.valuator = CardValuator()
         os.makedirs(self.image_dir, exist_ok=True)
+        self.presence = CardPresenceDetector(os.path.join(self.image_dir, DEFAULT_EMPTY_TRAY_REFERENCE), threshold=presence_threshold)
+        self.quality_gate = CaptureQualityGate(self.presence)
+        self.max_captures = max_captures
+        self.capture_stats = {"recaptures": 0, "accepted_low_quality": 0}
         gpio.setup(self.home_sensor_pin, gpio.IN)
         # runtime state
-        self.current_position = 0
+        self.current_position = 0  # last magazine slot that received a card
+        self.magazine_slot = 1  # slot the magazine is physically positioned at
+        self.paused_reason = None  # e.g. 'stack_empty' if the last run paused because no card arrived
         self._stop_event = None
         self._thread = None
         self.on_card_processed = None  # Callback(card: CardData, position: int)
+        self.on_card_valued = None  # Callback(card: CardData) once marktwert is known, may run in a worker thread
+
+    @property
+    def camera(self):
+        if self._camera is None:
+            self._camera = create_camera()
+        return self._camera
 
     def move_magazine_to_home(self, step_delay=0.005, max_steps=10000):
         print("Moving Magazin to home")
@@ -47,12 +65,52 @@ class ProcessController:
             self.motor.move_motor(Motor.MotorMagazin, Direction.Backward, 1, step_delay)
             steps += 1
         print(f"Magazine homed after {steps} steps.")
+        self.magazine_slot = 1
 
     def advance_magazine_positions(self, positions=1):
         """Advance the magazine forward by `positions` (each position uses magazine_move_steps)."""
         total_steps = positions * self.magazine_move_steps
         if total_steps > 0:
             self.motor.move_motor(Motor.MotorMagazin, Direction.Forward, total_steps)
+            self.magazine_slot += positions
+
+    def calibrate_empty_tray(self):
+        """Store the current low-res frame as reference of the empty tray. Make sure no card lies in the tray."""
+        self.presence.set_reference(self.camera.capture_lores())
+        print("Referenzbild für leeres Fach gespeichert.")
+
+    def is_card_present(self) -> bool:
+        """Fast check on the low-res stream whether a card was separated into the tray."""
+        present = self.presence.is_card_present(self.camera.capture_lores())
+        if not present:
+            print("Keine Karte im Fach erkannt.")
+        return present
+
+    def capture_card(self, image_path):
+        """
+        Capture the card in the tray and check the quality of the capture (sharpness, glare, skew) before it is
+        sent to the API. A blurred capture is repeated up to max_captures times, a skewed card or glare would
+        look the same again and is only recorded. A capture that is still bad is used anyway.
+        Returns (CaptureQuality or None if the camera gives no frame to check, number of captures).
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self.camera.capture(output_path=image_path, show_preview=False)
+            if self.camera.last_settle_time is not None:
+                print(f"Kamera bereit nach {self.camera.last_settle_time:.2f}s")
+            if self.camera.last_frame is None:
+                return None, attempt
+            quality = self.quality_gate.assess(self.camera.last_frame)
+            if quality.ok:
+                return quality, attempt
+            if not quality.recapturable or attempt >= self.max_captures:
+                break
+            print(f"Aufnahme {attempt} unbrauchbar ({', '.join(quality.problems)}), nehme erneut auf")
+            self.capture_stats["recaptures"] += 1
+        print(f"Aufnahme {attempt} {', '.join(quality.problems)}, verwende sie trotzdem")
+        self.capture_stats["accepted_low_quality"] += 1
+        return quality, attempt
 
     def run(self, home_magazine=False, start_index=1, magazin_name=None):
         """
@@ -69,60 +127,99 @@ class ProcessController:
             self.move_magazine_to_home()
 
         # If starting from a later index, advance magazine to that slot
-        if start_index > 1:
-            # advance (start_index-1) positions
-            self.advance_magazine_positions(start_index - 1)
+        if start_index > self.magazine_slot:
+            self.advance_magazine_positions(start_index - self.magazine_slot)
 
         results: list[CardData] = []
+        valued: list[threading.Event] = []  # one per card, set once its market value is known
+        run_csv = {'path': None}  # set once the run CSV was written, late valuations rewrite it
+        csv_lock = threading.Lock()
+
+        def card_valued(card: CardData, event: threading.Event):
+            self._card_valued(card)
+            with csv_lock:
+                event.set()
+                if run_csv['path'] and all(e.is_set() for e in valued):
+                    write_carddata_csv(results, run_csv['path'])
+                    print(f"Alle Marktwerte ermittelt, CSV aktualisiert: {run_csv['path']}")
         self.current_position = start_index - 1
+        self.paused_reason = None
+        if not self.presence.has_reference:
+            print("Warnung: Kein Referenzbild für das leere Fach, ein leerer Stapel wird nicht erkannt. Bitte das leere Fach kalibrieren.")
         for i in range(start_index, self.magazine_size + 1):
             # 1. Motor: Separate card
             if self._stop_event is not None and self._stop_event.is_set():
                 print("Stop requested before separating card. Exiting loop.")
                 break
             self.motor.move_motor(Motor.MotorCards, Direction.Forward, self.separate_steps)
-            # 2. Capture image
-            image_timestamp = int(time.time())
+            # 2. Check on the low-res stream that a card arrived (stack empty or misfeed otherwise).
+            #    Pause here, the magazine stays at slot i so the run can be resumed from this position.
+            if not self.is_card_present():
+                print(f"Pausiere an Position {i}: keine Karte vereinzelt (Stapel leer oder Fehleinzug).")
+                self.paused_reason = 'stack_empty'
+                break
+            # 3. Capture image
+            image_timestamp = int(time.time() * 1000)  # ms, the image path identifies the card in the journal
             image_filename = f"image_{image_timestamp}.png"
             image_path = os.path.join(self.image_dir, image_filename)
-            self.camera.capture(output_path=image_path, show_preview=False)
-            # 3. Recognize card
+            quality, captures = self.capture_card(image_path)
+            # 4. Recognize card (identification only, the market value is determined in the background)
             card: CardData = self.recognizer.recognize(image_path)
-            # 4. Save CardData object for later CSV export
+            # 5. Save CardData object for later CSV export
             # attach the image_path to the CardData so csv writer can use the filename
             card.image_path = image_path
             card.magazin_name = magazin_name
             card.magazin_index = i
+            card.settle_time = self.camera.last_settle_time
+            card.capture_count = captures
+            if quality is not None:
+                card.quality_sharpness = round(quality.sharpness, 1)
+                card.quality_glare = round(quality.glare, 4)
+                card.quality_skew = round(quality.skew, 2) if quality.skew is not None else None
+                card.quality_problems = quality.problems
             results.append(card)
             self.current_position = i
             # Notify about processed card
             if self.on_card_processed:
                 self.on_card_processed(card, i)
-            # 5. Motor: Output card (move forward)
+            event = threading.Event()
+            valued.append(event)
+            self.valuator.submit(card, lambda card, event=event: card_valued(card, event))
+            # 6. Motor: Output card (move forward)
             if self._stop_event is not None and self._stop_event.is_set():
                 print("Stop requested after recognition. Attempting to cleanup and exit.")
                 break
             self.motor.move_motor(Motor.MotorCards, Direction.Forward, self.output_steps)
-            # 6. Motor: Move magazine (skip on last iteration)
+            # 7. Motor: Move magazine (skip on last iteration)
             if i < self.magazine_size:
-                self.motor.move_motor(Motor.MotorMagazin, Direction.Forward, self.magazine_move_steps)
-                # update current position after magazine move
-                self.current_position = i + 1
+                self.advance_magazine_positions(1)
             print(f"Karte gelesen: {card}")
             
         
-        if i == self.magazine_size:
+        if self.current_position == self.magazine_size:
             # Move magazine back to starting position after loop, but only if we finished the complete magazine
             print("Move: Return to start")
             self.move_magazine_to_home()
 
         # self.motor.cleanup()
-        # Save results to CSV using helper
+        # Save results to CSV using helper. Market values still being determined do not hold up the run,
+        # the CSV is written again once the last of them arrived
         timestamp = int(time.time())
         csv_filename = f"single_magazin_{timestamp}.csv"
         csv_path = os.path.join(os.getcwd(), "csv", csv_filename)
-        write_carddata_csv(results, csv_path)
+        with csv_lock:
+            write_carddata_csv(results, csv_path)
+            pending = sum(1 for event in valued if not event.is_set())
+            if pending:
+                run_csv['path'] = csv_path
         print(f"Prozess abgeschlossen. Ergebnisse gespeichert in {csv_path}")
+        if pending:
+            print(f"{pending} Marktwerte noch ausstehend, die CSV wird aktualisiert sobald sie vorliegen")
+
+    def _card_valued(self, card: CardData):
+        print(f"Marktwert ermittelt: {card.kartenname} -> {card.marktwert}")
+        if self.on_card_valued:
+            self.on_card_valued(card)
 
     # --- Async control ---
     def start_async(self, home_magazine=False, start_index=1, magazin_name=None):
@@ -151,6 +248,41 @@ class ProcessController:
             except Exception as e:
                 print(f"Error during emergency cleanup: {e}")
 
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    @property
+    def pending_valuations(self) -> int:
+        return self.valuator.pending
+
+    def submit_valuation(self, card: CardData):
+        """Value a card that was recognized earlier (e.g. restored from the journal) in the background"""
+        self.valuator.submit(card, self._card_valued)
+
+    def recognition_stats(self) -> dict:
+        stats = self.recognizer.stats.as_dict()
+        stats["valuation"] = self.valuator.stats()
+        stats["capture"] = dict(self.capture_stats)
+        return stats
+
+    def warm_up(self) -> dict:
+        """Open the camera and create the API clients. Each is tried on its own so one failure does not block the others."""
+        steps = [
+            ("camera", lambda: self.camera.warm_up()),
+            ("recognizer", lambda: self.recognizer.describer),
+            ("valuator", lambda: self.valuator.describer),
+        ]
+        results = {}
+        for name, step in steps:
+            start = time.time()
+            try:
+                step()
+                results[name] = f"ok ({time.time() - start:.2f}s)"
+            except Exception as e:
+                results[name] = f"failed: {e}"
+            print(f"Warm-up {name}: {results[name]}")
+        return results
+
 if __name__ == "__main__":
     gpio.setmode(gpio.BCM)
     controller = ProcessController()
@@ -1,9 +1,14 @@
 import time
 import os
+import threading
 from typing import List, Optional, Dict
-from gpio_manager import gpio
-from process_control import ProcessController
 from carddata import CardData
+from image_ki import RecognitionStats, PENDING
+from card_journal import CardJournal, DEFAULT_JOURNAL_PATH
+from card_values import normalize_card
+from inventory import InventoryAggregates
+from card_search import CardSearchIndex, DEFAULT_SEARCH_LIMIT
+from hardware_runner import HardwareClient
 
 
 class ProcessManager:
@@ -12,32 +17,151 @@ class ProcessManager:
     Provides a high-level interface for the web API to control the process and access data.
     """
     
-    def __init__(self):
-        self._controller: Optional[ProcessController] = None
-        self._all_cards: List[CardData] = []
+    def __init__(self, journal_path: str = None):
+        self._controller: Optional[HardwareClient] = None  # ProcessController running in its own process
+        self._controller_lock = threading.Lock()  # start_process and the background warm-up may race
+        self._warm_up_status: Dict[str, str] = {}
         self._current_run_start: Optional[float] = None
         self._initial_home_done = False  # Track if initial homing has been done
-        self._last_run_finished = False  # Track if last run finished completely
         self._notification: Optional[str] = None  # Store notification message
-    
+        # Cards and position of previous sessions, restored from the journal by restore() in the background warm-up
+        self._journal = CardJournal(journal_path or os.path.join(os.getcwd(), DEFAULT_JOURNAL_PATH))
+        self._restore_lock = threading.Lock()
+        self._restored = threading.Event()
+        self._all_cards: List[CardData] = []
+        self._last_run_finished = False  # Track if last run finished completely
+        self._resume_position = 0  # Slot of an interrupted run
+        self._resume_magazin_name: Optional[str] = None
+        self._aggregates = InventoryAggregates()
+        self._search_index = CardSearchIndex()
+
+    def restore(self) -> None:
+        """
+        Replay the journal and rebuild aggregates and search index. Runs once; with many cards this takes
+        seconds, so it runs in the warm-up instead of at import time. Callers needing the state wait for it.
+        """
+        with self._restore_lock:
+            if self._restored.is_set():
+                return
+            state = self._journal.load()
+            aggregates = InventoryAggregates()
+            search_index = CardSearchIndex()
+            for card in state.cards:
+                normalize_card(card)
+            aggregates.add_all(state.cards)
+            search_index.add_all(state.cards)
+            self._all_cards = state.cards
+            self._last_run_finished = state.last_run_finished
+            self._resume_position = 0 if state.last_run_finished else state.current_position
+            self._resume_magazin_name = state.magazin_name
+            self._aggregates = aggregates
+            self._search_index = search_index
+            self._restored.set()
+
+    @property
+    def restored(self) -> bool:
+        return self._restored.is_set()
+
+    def _get_controller(self) -> HardwareClient:
+        """Initialize the controller on first use"""
+        with self._controller_lock:
+            if not self._controller:
+                self._create_controller()
+        return self._controller
+
+    def _create_controller(self) -> None:
+        self.restore()  # resume position and pending valuations come from the journal
+        # Starts the hardware runner process, motor, camera and recognition modules are only imported there
+        controller = HardwareClient()
+        controller.current_position = self._resume_position
+        controller.magazin_name = self._resume_magazin_name
+        controller.on_card_valued = self._on_card_valued
+        controller.on_runner_restarted = self._on_runner_restarted
+        # Cards restored from the journal whose valuation did not finish before shutdown
+        for card in self._all_cards:
+            if card.marktwert == PENDING:
+                controller.submit_valuation(card)
+        self._controller = controller
+
+    def warm_up(self) -> Dict[str, str]:
+        """
+        Initialize hardware and API clients ahead of the first run.
+        Every subsystem is tried on its own so one failing does not keep the others from starting.
+        """
+        start = time.time()
+        try:
+            self.restore()
+            self._warm_up_status["journal"] = f"ok, {len(self._all_cards)} cards ({time.time() - start:.2f}s)"
+        except Exception as e:
+            self._warm_up_status["journal"] = f"failed: {e}"
+        print(f"Warm-up journal: {self._warm_up_status['journal']}")
+        start = time.time()
+        try:
+            self._get_controller()
+            self._warm_up_status["controller"] = f"ok ({time.time() - start:.2f}s)"
+        except Exception as e:
+            self._warm_up_status["controller"] = f"failed: {e}"
+        print(f"Warm-up controller: {self._warm_up_status['controller']}")
+        if not self._controller:
+            for name in ("camera", "recognizer", "valuator"):
+                self._warm_up_status[name] = "skipped: controller not available"
+        else:
+            try:
+                # camera, recognizer and valuator, tried one by one inside the hardware runner
+                self._warm_up_status.update(self._controller.warm_up())
+            except RuntimeError as e:
+                for name in ("camera", "recognizer", "valuator"):
+                    self._warm_up_status[name] = f"failed: {e}"
+        return dict(self._warm_up_status)
+
+    def get_warm_up_status(self) -> Dict[str, str]:
+        """Result per subsystem of the last warm-up, empty while it has not finished"""
+        return dict(self._warm_up_status)
+
+    def _on_card_valued(self, card: CardData) -> None:
+        old_value = (card.marktwert_wert, card.marktwert_waehrung)
+        normalize_card(card)
+        self._aggregates.update_value(card, old_value)
+        self._journal.record_valuation(card)
+
+    def _on_runner_restarted(self) -> None:
+        # The magazine position of the new runner is unknown: home again on the next start and continue the
+        # interrupted run from the slot after the last card, like after a restart of the whole server
+        self._resume_position = 0 if self._last_run_finished or self._magazine_full() else self._controller.current_position
+        self._resume_magazin_name = self._controller.magazin_name
+        self._initial_home_done = False
+
+    def _magazine_full(self) -> bool:
+        """
+        The last slot of the magazine received a card. Decided from the position, not from the cards of the
+        current run: a run resumed partway (after a stack_empty pause or from the journal) has fewer cards.
+        """
+        magazine_size = self._controller.magazine_size
+        return bool(magazine_size) and self._controller.current_position >= magazine_size
+
     def start_process(self, magazin_name: str) -> None:
         """Start the processing with given parameters"""
-        # Initialize controller if needed
-        if not self._controller:
-            gpio.setmode(gpio.BCM)
-            self._controller = ProcessController()
+        # Initialize controller if needed, a crashed runner is replaced before the start slot is decided
+        self._get_controller()
+        self._controller.ensure_running()
 
         # Check if already running
-        if self._controller._thread and self._controller._thread.is_alive():
+        if self._controller.is_running():
             raise RuntimeError("Process already running")
 
         # Perform initial homing if not done yet
         if not self._initial_home_done:
             self._controller.move_magazine_to_home()
             self._initial_home_done = True
-            start_index = 1  # After homing, always start from beginning
-            self._controller.current_position = 0  # Reset position to 0 (will be 1 when processing starts)
-        elif self._last_run_finished:
+            if self._resume_position and magazin_name == self._resume_magazin_name:
+                # Continue the run interrupted before the last shutdown, run() advances the magazine to the slot
+                start_index = self._resume_position + 1
+            else:
+                start_index = 1  # After homing, start from beginning
+            self._resume_position = 0
+            self._last_run_finished = False  # a finished run restored from the journal needs no second homing
+            self._controller.current_position = start_index - 1
+        elif self._last_run_finished or self._magazine_full():
             # If the last run finished completely, go back to home position
             self._controller.move_magazine_to_home()
             start_index = 1
@@ -46,18 +170,26 @@ class ProcessManager:
         else:
             # Continue from where we left off
             start_index = self._controller.current_position + 1
+
+        self._current_run_start = time.time()
+        run_id = int(self._current_run_start)
         
         def on_card_processed(card: CardData, position: int):
             # Set the magazine info and processed time on the card
             card.magazin_name = self._controller.magazin_name
             card.magazin_index = position
             card.processed_at = time.time()
-            # Store card in the list
+            card.run_id = run_id
+            normalize_card(card)
+            # Persist before storing in memory so a crash can not lose the recognition
+            self._journal.record_card(card)
             self._all_cards.append(card)
+            self._aggregates.add(card)
+            self._search_index.add(card)
         
         # Set up callback and start
-        self._current_run_start = time.time()
         self._notification = None  # Clear any previous notification
+        self._journal.record_run_start(magazin_name, start_index, self._controller.magazine_size, self._current_run_start)
         self._controller.on_card_processed = on_card_processed
         return self._controller.start_async(
             magazin_name=magazin_name,
@@ -65,6 +197,13 @@ class ProcessManager:
             home_magazine=False  # Never automatically home the magazine
         )
     
+    def calibrate_empty_tray(self) -> None:
+        """Capture the reference frame of the empty tray used to detect an empty stack"""
+        controller = self._get_controller()
+        if controller.is_running():
+            raise RuntimeError("Process running, cannot calibrate")
+        controller.calibrate_empty_tray()
+
     def stop_process(self, emergency: bool = False) -> None:
         """Stop the current process"""
         if self._controller:
@@ -73,16 +212,24 @@ class ProcessManager:
             if not self._last_run_finished:
                 self._current_run_start = None  # Reset run timer when manually stopping
     
+    def shutdown(self) -> None:
+        """Stop the hardware runner process"""
+        if self._controller:
+            self._controller.shutdown()
+
     def get_status(self) -> dict:
         """Get current process status including statistics"""
         if not self._controller:
             return {
                 "running": False,
-                "current_position": 0,
-                "magazin_name": None,
+                "current_position": self._resume_position,
+                "magazin_name": self._resume_magazin_name,
                 "total_cards_processed": len(self._all_cards),
                 "current_run_cards": 0,
                 "current_run_time": 0,
+                "pending_valuations": 0,
+                "has_reference": None,
+                "journal_restored": self.restored,
                 "notification": self._get_and_clear_notification()
             }
         
@@ -94,17 +241,23 @@ class ProcessManager:
                 if card.processed_at >= self._current_run_start
             )
         
-        is_running = self._controller._thread and self._controller._thread.is_alive()
+        is_running = self._controller.is_running()
         current_run_time = 0
         
         if is_running:
             if self._current_run_start:
                 current_run_time = time.time() - self._current_run_start
         else:
-            if current_run_cards >= self._controller.magazine_size:
+            if self._controller.paused_reason:
+                # Run paused because no card arrived in the tray, it continues from the current position on next start
+                print(f"Sending {self._controller.paused_reason} notification")
+                self._notification = self._controller.paused_reason
+                self._controller.paused_reason = None
+                self._current_run_start = None
+            elif self._current_run_start and self._magazine_full():
                 print(f"Sending run_finished notification")
 
-                # Process finished naturally - all cards from magazine were processed
+                # Process finished naturally - the last slot of the magazine was filled
                 self._notification = "run_finished"
                 self._last_run_finished = True
                 self._current_run_start = None  # Clear the run start time after detecting finish
@@ -116,9 +269,18 @@ class ProcessManager:
             "total_cards_processed": len(self._all_cards),
             "current_run_cards": current_run_cards,
             "current_run_time": current_run_time,
+            "pending_valuations": self._controller.pending_valuations,
+            "has_reference": self._controller.has_reference,  # False: empty tray not calibrated, empty stacks go unnoticed
+            "journal_restored": self.restored,
             "notification": self._get_and_clear_notification()
         }
     
+    def get_recognition_stats(self) -> dict:
+        """Parse failure and retry counters of the card recognition"""
+        if not self._controller:
+            return RecognitionStats().as_dict()
+        return self._controller.recognition_stats() or RecognitionStats().as_dict()
+
     def _get_and_clear_notification(self) -> Optional[str]:
         """Get the current notification and clear it"""
         notification = self._notification
@@ -150,6 +312,14 @@ class ProcessManager:
         write_carddata_csv(all_results, path)
         return path
     
+    def get_aggregates(self, magazin_name: Optional[str] = None, run_id: Optional[int] = None) -> dict:
+        """Count, total/median value and condition distribution overall, per magazine and per run"""
+        return self._aggregates.as_dict(magazin_name=magazin_name, run_id=run_id)
+
+    def search_cards(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[CardData]:
+        """Find processed cards by kartenname, edition, kartennummer or verlag (prefixes, umlauts and accents folded)"""
+        return self._search_index.search(query, limit=limit)
+
     def get_processed_cards(self, magazin_name: Optional[str] = None) -> List[CardData]:
         """Get all processed cards, optionally filtered by magazine"""
         if magazin_name:
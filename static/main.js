@@ -30,6 +30,8 @@ function updateStatus(status) {
     if (status.notification) {
         if (status.notification === 'run_finished') {
             showNotification(t('messages.runFinished') || 'Run Finished!', 'success');
+        } else if (status.notification === 'stack_empty') {
+            showNotification(t('messages.stackEmpty') || 'No card detected, run paused.', 'warning');
         }
     }
     
@@ -56,6 +58,9 @@ function updateStatus(status) {
         stopBtn.disabled = true;
         emergencyBtn.disabled = true;
     }
+    document.getElementById('calibrateBtn').disabled = status.running;
+    // Without an empty tray reference an empty stack is not detected
+    document.getElementById('calibrateHint').classList.toggle('d-none', status.has_reference !== false);
 }
 
 // Show notification modal that requires acknowledgment
@@ -186,6 +191,21 @@ document.getElementById('emergencyBtn').addEventListener('click', async function
     }
 });
 
+// Calibrate empty tray button
+document.getElementById('calibrateBtn').addEventListener('click', async function() {
+    if (confirm(t('messages.confirmCalibrate'))) {
+        try {
+            const response = await fetch('/camera/calibrate-empty', { method: 'POST' });
+            if (!response.ok) {
+                const error = await response.json();
+                alert(`${t('messages.calibrateError')}: ${error.detail}`);
+            }
+        } catch (error) {
+            alert(t('messages.calibrateError') + ': ' + error);
+        }
+    }
+});
+
 // Export button
 document.getElementById('exportBtn').addEventListener('click', async function() {
     try {
@@ -0,0 +1,134 @@
+import json
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from gemini_request import GeminiImageDescriber
+from carddata import CardData
+from image_ki import UNKNOWN, build_schema
+
+# === Default Configurable Constants ===
+DEFAULT_VALUATION_WORKERS = 2
+DEFAULT_VALUATION_TTL = 24 * 60 * 60  # seconds a cached market value stays valid
+# =====================================
+
+VALUATION_PROMPT = """
+Ermittle den aktuellen Marktwert dieser Sammelkarte anhand von Verkaufsdaten (eBay, TCGPlayer, Cardmarket).
+Beziehe den Zustand mit ein (Skala: Perfekt, Booster Frisch, Leichte Gebrauchspuren, Sichtbare Abnutzung, Starke Abnutzung, Beschädigt, Kaputt), ziehe pro Stufe 14,28 % ab.
+Gib den Wert mit Währung an, wenn unbekannt dann "unbekannt".
+Kartenname: {kartenname}
+Edition: {edition}
+Kartennummer: {kartennummer}
+Sprache: {sprache}
+Verlag: {verlag}
+Erscheinungsjahr: {erscheinungsjahr}
+Limitierung: {limitierung}
+Zustand: {zustand}
+"""
+
+
+def valuation_key(card: CardData) -> Tuple[str, str, str, str]:
+    """Cards with the same name, edition, number and condition share one market value"""
+    return tuple((value or '').strip().lower() for value in (card.kartenname, card.edition, card.kartennummer, card.zustand))
+
+
+class CardValuator:
+    """
+    Determines `marktwert` for identified cards in the background.
+    Results are memoized per valuation_key for `ttl` seconds, concurrent requests for the same key are merged.
+    """
+
+    def __init__(self, describer: Optional[GeminiImageDescriber] = None, ttl=DEFAULT_VALUATION_TTL, max_workers=DEFAULT_VALUATION_WORKERS):
+        self._describer = describer
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='valuation')
+        self._lock = threading.RLock()  # reentrant: done callbacks may run synchronously while holding it
+        self._cache: Dict[tuple, Tuple[str, float]] = {}  # key -> (marktwert, valued_at)
+        self._in_flight: Dict[tuple, Future] = {}
+        self.requests = 0
+        self.cache_hits = 0
+
+    @property
+    def describer(self) -> GeminiImageDescriber:
+        """API client, created on first use (raises ValueError without API key)"""
+        if self._describer is None:
+            self._describer = GeminiImageDescriber()
+        return self._describer
+
+    @property
+    def pending(self) -> int:
+        """Number of valuations currently waiting for the API"""
+        with self._lock:
+            return len(self._in_flight)
+
+    def _cached(self, key) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry and time.time() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def _request(self, card: CardData) -> str:
+        prompt = VALUATION_PROMPT.format(**{field: getattr(card, field) for field in (
+            'kartenname', 'edition', 'kartennummer', 'sprache', 'verlag', 'erscheinungsjahr', 'limitierung', 'zustand')})
+        generation_config = {"responseMimeType": "application/json", "responseSchema": build_schema(('marktwert',))}
+        description = self.describer.describe_text(prompt, generation_config=generation_config)
+        print("CardValuator: Return: " + str(description))
+        try:
+            value = json.loads(description).get('marktwert')
+        except (json.JSONDecodeError, AttributeError):
+            value = None
+        if not isinstance(value, str) or not value.strip():
+            return UNKNOWN
+        return value.strip().replace(';', ',')
+
+    def _future_for(self, card: CardData) -> Future:
+        """Cached value as completed future, otherwise the (possibly shared) in-flight request"""
+        key = valuation_key(card)
+        with self._lock:
+            cached = self._cached(key)
+            if cached is not None:
+                self.cache_hits += 1
+                future = Future()
+                future.set_result(cached)
+                return future
+            future = self._in_flight.get(key)
+            if future is None:
+                self.requests += 1
+                future = self._executor.submit(self._request, card)
+                self._in_flight[key] = future
+                future.add_done_callback(lambda f, key=key: self._store(key, f))
+            return future
+
+    def _store(self, key, future: Future) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if future.exception() is None:
+                self._cache[key] = (future.result(), time.time())
+
+    def submit(self, card: CardData, on_valued: Optional[Callable[[CardData], None]] = None) -> Future:
+        """Value the card in the background, sets card.marktwert and calls on_valued(card) when done"""
+        def done(future: Future):
+            try:
+                card.marktwert = future.result()
+            except Exception as e:
+                print(f"CardValuator: Valuation failed for {card.kartenname}: {e}")
+                card.marktwert = UNKNOWN
+            if on_valued:
+                on_valued(card)
+        future = self._future_for(card)
+        future.add_done_callback(done)
+        return future
+
+    def value(self, card: CardData) -> str:
+        """Value the card synchronously (blocking), sets and returns card.marktwert"""
+        card.marktwert = self._future_for(card).result()
+        return card.marktwert
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "cache_hits": self.cache_hits,
+                "pending": len(self._in_flight),
+                "cached_values": len(self._cache),
+            }
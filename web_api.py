@@ -38,6 +38,13 @@ async def broadcast_status():
 async def startup_event():
     """Start the status broadcast task when the app starts"""
     asyncio.create_task(broadcast_status())
+    # Initialize hardware and API clients in the background so the UI is reachable right away
+    asyncio.get_running_loop().run_in_executor(None, process_manager.warm_up)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Stop the hardware runner process together with the server"""
+    process_manager.shutdown()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -72,17 +79,57 @@ async def stop_process(emergency: Optional[bool] = False):
     process_manager.stop_process(emergency=emergency)
     return {"status": "stopping"}
 
+@app.post("/camera/calibrate-empty")
+async def calibrate_empty_tray():
+    """Store the reference frame of the empty card tray"""
+    try:
+        process_manager.calibrate_empty_tray()
+        return {"status": "calibrated"}
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/system/warm-up")
+async def get_warm_up_status():
+    """Get the initialization result of each hardware/API subsystem"""
+    return process_manager.get_warm_up_status()
+
 @app.get("/process/status")
 async def get_status():
     """Get current process status"""
     return process_manager.get_status()
 
+@app.get("/recognition/stats")
+async def get_recognition_stats():
+    """Get parse failure and retry rates of the card recognition"""
+    return process_manager.get_recognition_stats()
+
 @app.post("/csv/export-all")
 async def export_all_cards():
     """Export all processed cards to CSV"""
     path = process_manager.export_all_cards_csv()
     return {"csv_path": path}
 
+@app.get("/inventory/aggregates")
+async def get_aggregates(magazin_name: Optional[str] = None, run_id: Optional[int] = None):
+    """Get card count, total/median value and condition distribution, optionally for one magazine or run"""
+    return process_manager.get_aggregates(magazin_name=magazin_name, run_id=run_id)
+
+@app.get("/cards/search")
+async def search_cards(q: str, limit: int = 50):
+    """Find processed cards by name, edition, number or publisher to locate their magazine slot"""
+    cards = process_manager.search_cards(q, limit=limit)
+    return {"cards": [
+        {
+            "kartenname": card.kartenname,
+            "edition": card.edition,
+            "kartennummer": card.kartennummer,
+            "verlag": card.verlag,
+            "magazin_name": card.magazin_name,
+            "magazin_index": card.magazin_index,
+        }
+        for card in cards
+    ]}
+
 @app.get("/cards")
 async def get_cards(magazin_name: Optional[str] = None):
     """Get list of processed cards, optionally filtered by magazine"""